@@ -1,29 +1,19 @@
 from flask import Flask, request, jsonify
-from flask_cors import CORS
 import os
 import sys
 
 # Add backend to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
-from mongo_search import MongoSearchEngine
+from mongo_singleton import get_engine, install_cors
 
 app = Flask(__name__)
-CORS(app)
-
-# Get MongoDB URI from environment
-MONGODB_URI = os.environ.get('MONGODB_URI', '')
-mongo_search_engine = None
-
-if MONGODB_URI:
-    try:
-        mongo_search_engine = MongoSearchEngine(MONGODB_URI)
-    except Exception as e:
-        print(f"MongoDB connection failed: {e}")
+install_cors(app)
 
 @app.route('/api/stats')
 def stats():
     """Get index statistics"""
+    mongo_search_engine = get_engine()
     try:
         if mongo_search_engine:
             stats_data = mongo_search_engine.get_stats()
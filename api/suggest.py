@@ -1,44 +1,53 @@
 from flask import Flask, request, jsonify
-from flask_cors import CORS
+from cachetools import TTLCache
 import os
 import sys
 
 # Add backend to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
-from mongo_search import MongoSearchEngine
+from mongo_singleton import get_engine, install_cors
+from request_params import MAX_SUGGESTIONS, bounded, install_param_errors
 
 app = Flask(__name__)
-CORS(app)
+install_cors(app)
+install_param_errors(app)
 
-# Get MongoDB URI from environment
-MONGODB_URI = os.environ.get('MONGODB_URI', '')
-mongo_search_engine = None
-
-if MONGODB_URI:
-    try:
-        mongo_search_engine = MongoSearchEngine(MONGODB_URI)
-    except Exception as e:
-        print(f"MongoDB connection failed: {e}")
+# Autocomplete repeats the same prefixes constantly; keep answers for a minute
+_SUGGEST_CACHE = TTLCache(maxsize=4096, ttl=60)
+CACHE_CONTROL = 'public, max-age=60, stale-while-revalidate=120'
 
 @app.route('/api/suggest')
 def suggest():
     """Get search suggestions"""
     query = request.args.get('q', '').strip().lower()
-    limit = int(request.args.get('limit', 8))
+    limit = bounded(request.args, 'limit', 8, int, 1, MAX_SUGGESTIONS)
 
     if not query or len(query) < 2:
         return jsonify({'suggestions': []})
 
+    key = (query, limit)
+    cached = _SUGGEST_CACHE.get(key)
+    if cached is not None:
+        return _cacheable(jsonify({'suggestions': cached}))
+
+    # Suggestions come from the engine's in-memory vocabulary, not a query
+    mongo_search_engine = get_engine()
     try:
         if mongo_search_engine:
             suggestions = mongo_search_engine.get_suggestions(query, limit)
-            return jsonify({'suggestions': suggestions})
+            _SUGGEST_CACHE[key] = suggestions
+            return _cacheable(jsonify({'suggestions': suggestions}))
         else:
             return jsonify({'suggestions': []}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _cacheable(response):
+    """Let the CDN and browser absorb repeated suggestion requests"""
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
 # Vercel serverless function handler
 def handler(request):
     with app.request_context(request.environ):
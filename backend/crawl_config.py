@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+Limits and page-text helpers shared by the crawlers and the MongoDB importer
+"""
+
+import re
+
+# Outbound links kept per crawled page document
+LINKS_PER_DOC = 50
+
+_WS_RE = re.compile(r'\s+')
+
+def text_and_snippet(text, description):
+    """Return (text, snippet), normalizing whitespace only when the snippet needs it"""
+    if description:
+        # The stored text is only tokenized downstream, so raw whitespace is harmless
+        return text, description[:200]
+    full_text = _WS_RE.sub(' ', text).strip()
+    return full_text, full_text[:200]
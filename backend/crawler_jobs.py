@@ -10,8 +10,52 @@ import uuid
 from datetime import datetime, timedelta
 from urllib.parse import urljoin, urlparse
 from collections import deque
+from itertools import islice
 from bs4 import BeautifulSoup
 import aiohttp
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from crawl_config import text_and_snippet
+from mongo_search import page_token_counts
+
+# selectolax is optional - falls back to BeautifulSoup when missing
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser
+        SELECTOLAX_AVAILABLE = True
+    except ImportError:
+        SELECTOLAX_AVAILABLE = False
+
+MAX_PAGE_BYTES = 512_000
+CRAWL_CONCURRENCY = 5
+# Upper bound for a client-requested per-job concurrency
+MAX_CRAWL_CONCURRENCY = 10
+MAX_LINKS = 20
+# Seconds without progress after which polling takes over a worker-owned job
+# (no worker picked it up, or the worker died mid-job)
+WORKER_STALE_AFTER = 60
+
+# Job fields a batch needs; nodes are only appended, never read
+BATCH_FIELDS = {
+    'status': 1,
+    'start_url': 1,
+    'max_depth': 1,
+    'max_pages': 1,
+    'stats': 1,
+    'visited': 1,
+    'worker': 1,
+    'concurrency': 1,
+    'updated_at': 1
+}
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=5, sock_read=3)
+REQUEST_HEADERS = {
+    'Accept': 'text/html',
+    'User-Agent': 'mini-search-bot/1.0 (+contact: you@example.com)'
+}
 
 class CrawlerJobManager:
     """Manages crawler jobs using MongoDB for state persistence"""
@@ -20,9 +64,33 @@ class CrawlerJobManager:
         self.db = mongo_client[db_name]
         self.jobs_collection = self.db.crawler_jobs
         self.pages_collection = self.db.crawled_pages
+        self.queue_collection = self.db.crawler_queue
+        self._session = None
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self):
+        """Create the indexes the job queries rely on (once per manager)"""
+        if self._indexes_ready:
+            return
+        await self.jobs_collection.create_index([('job_id', 1)], unique=True)
+        await self.jobs_collection.create_index([('status', 1), ('updated_at', 1)])
+        await self.queue_collection.create_index([('job_id', 1), ('_id', 1)])
+        await self.pages_collection.create_index([('start_url', 1), ('crawled_at', -1)])
+        try:
+            # Lets unordered page upserts dedupe on the server
+            await self.pages_collection.create_index('url', unique=True)
+        except Exception as e:
+            print(f"Could not create unique url index: {e}")
+        self._indexes_ready = True
+
+    async def create_job(self, start_url, max_depth=2, max_pages=50, worker=False, concurrency=CRAWL_CONCURRENCY):
+        """Create a new crawler job
 
-    async def create_job(self, start_url, max_depth=2, max_pages=50):
-        """Create a new crawler job"""
+        With worker=True the job is run by a background worker (see tasks.py)
+        and /process calls only report its progress. concurrency caps the
+        pages of a batch fetched at once.
+        """
+        await self._ensure_indexes()
         job_id = str(uuid.uuid4())
         job = {
             'job_id': job_id,
@@ -30,6 +98,8 @@ class CrawlerJobManager:
             'max_depth': max_depth,
             'max_pages': max_pages,
             'status': 'pending',
+            'worker': worker,
+            'concurrency': max(1, min(int(concurrency), MAX_CRAWL_CONCURRENCY)),
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow(),
             'stats': {
@@ -38,25 +108,59 @@ class CrawlerJobManager:
                 'queue_size': 1,
                 'duration': 0
             },
-            'queue': [{'url': start_url, 'depth': 0, 'parent': None}],
             'visited': [],
             'nodes': []
         }
         await self.jobs_collection.insert_one(job)
+        await self.queue_collection.insert_one(
+            {'job_id': job_id, 'url': start_url, 'depth': 0, 'parent': None}
+        )
         return job_id
 
     async def get_job(self, job_id):
         """Get job status"""
         return await self.jobs_collection.find_one({'job_id': job_id})
 
-    async def process_job_batch(self, job_id, batch_size=5, timeout=8):
+    async def set_worker(self, job_id, worker):
+        """Hand a job to the background worker, or back to polling"""
+        await self.jobs_collection.update_one({'job_id': job_id}, {'$set': {'worker': worker}})
+
+    async def _get_session(self):
+        """Return the pooled HTTP session shared by every batch this manager processes"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=20,
+                    limit_per_host=5,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=30
+                )
+            )
+        return self._session
+
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def process_job_batch(self, job_id, batch_size=5, timeout=8, from_worker=False):
         """Process a batch of URLs from the job queue (time-limited for serverless)"""
-        job = await self.get_job(job_id)
+        # Skip the growing nodes array; the final update returns the full job
+        job = await self.jobs_collection.find_one({'job_id': job_id}, projection=BATCH_FIELDS)
         if not job:
             return {'error': 'Job not found'}
 
         if job['status'] == 'completed':
-            return job
+            return await self.get_job(job_id)
+
+        # Jobs owned by a background worker are only reported on when polled,
+        # unless the worker has stopped making progress
+        if job.get('worker') and not from_worker:
+            if datetime.utcnow() - job['updated_at'] < timedelta(seconds=WORKER_STALE_AFTER):
+                return await self.get_job(job_id)
+            print(f"⚠ Worker made no progress on job {job_id}; polling takes over")
+            await self.set_worker(job_id, False)
 
         # Mark as running
         await self.jobs_collection.update_one(
@@ -65,181 +169,305 @@ class CrawlerJobManager:
         )
 
         start_time = time.time()
-        processed = 0
-
-        async with aiohttp.ClientSession() as session:
-            while job['queue'] and processed < batch_size:
-                # Check timeout (leave 2s buffer for cleanup)
-                if time.time() - start_time > timeout:
-                    break
-
-                # Stop if max pages reached
-                if len(job['visited']) >= job['max_pages']:
-                    break
-
-                # Get next URL from queue
-                current = job['queue'].pop(0)
+        await self._ensure_indexes()
+        session = await self._get_session()
+
+        # Set for O(1) membership tests; only this batch's additions are persisted
+        visited_set = set(job['visited'])
+        new_visited = []
+        new_nodes = []
+
+        # Dequeue the whole batch up front so the pages can be fetched concurrently.
+        # Overlapping /process calls may be working the same queue, so queue
+        # accounting below is by delta and completion reads the queue itself
+        batch = []
+        dequeued = 0
+        while len(batch) < batch_size:
+            # Stop if max pages reached
+            if len(job['visited']) >= job['max_pages']:
+                break
+
+            # Get next URL from queue
+            current = await self.queue_collection.find_one_and_delete(
+                {'job_id': job_id}, sort=[('_id', 1)]
+            )
+            if not current:
+                break
+            dequeued += 1
+            url = current['url']
+
+            # Skip if already visited
+            if url in visited_set:
+                continue
+
+            visited_set.add(url)
+            job['visited'].append(url)
+            new_visited.append(url)
+
+            # Add node as crawling
+            node = {
+                'url': url,
+                'depth': current['depth'],
+                'status': 'crawling',
+                'parent': current['parent']
+            }
+            new_nodes.append(node)
+            batch.append((current, node))
+
+        # Crawl the pages
+        base_netloc = urlparse(job['start_url']).netloc
+        sem = asyncio.Semaphore(job.get('concurrency', CRAWL_CONCURRENCY))
+
+        async def _bounded(current):
+            async with sem:
+                return await self._crawl_page(current['url'], current['depth'], session, base_netloc)
+
+        # The whole batch shares the time budget; pages still being fetched
+        # when it runs out go back on the queue for the next batch
+        tasks = [asyncio.create_task(_bounded(current)) for current, _ in batch]
+        unfinished = set()
+        if tasks:
+            _, unfinished = await asyncio.wait(tasks, timeout=max(0.0, timeout - (time.time() - start_time)))
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+        requeue = []
+        finished = []
+        for task, (current, node) in zip(tasks, batch):
+            if task in unfinished:
                 url = current['url']
-                depth = current['depth']
-                parent = current['parent']
-
-                # Skip if already visited
-                if url in job['visited']:
-                    continue
-
-                job['visited'].append(url)
-
-                # Add node as crawling
-                node = {
-                    'url': url,
-                    'depth': depth,
-                    'status': 'crawling',
-                    'parent': parent
-                }
-                job['nodes'].append(node)
-
-                # Crawl the page
-                try:
-                    page_data, links = await self._crawl_page(url, depth, session, job['start_url'])
-
-                    if page_data:
-                        # Update node status
-                        job['nodes'][-1].update({
-                            'status': 'completed',
-                            'title': page_data['title'],
-                            'linkCount': len(links)
+                visited_set.discard(url)
+                job['visited'].remove(url)
+                new_visited.remove(url)
+                new_nodes.remove(node)
+                requeue.append({k: current[k] for k in ('job_id', 'url', 'depth', 'parent')})
+            else:
+                finished.append(((current, node), task.exception() or task.result()))
+        if requeue:
+            await self.queue_collection.insert_many(requeue)
+
+        # URLs still waiting in the queue, so links aren't enqueued twice
+        queued_set = set(await self.queue_collection.distinct('url', {'job_id': job_id}))
+
+        page_ops = []
+        new_entries = []
+        for (current, node), result in finished:
+            url = current['url']
+            depth = current['depth']
+            parent = current['parent']
+
+            if isinstance(result, BaseException):
+                node['status'] = 'error'
+                print(f"Error crawling {url}: {result}")
+                continue
+
+            page_data, links = result
+            if not page_data:
+                node['status'] = 'error'
+                continue
+
+            # Update node status
+            node.update({
+                'status': 'completed',
+                'title': page_data['title'],
+                'linkCount': len(links)
+            })
+
+            page_ops.append(self._page_upsert(url, page_data, depth, parent, job['start_url']))
+
+            # Add new links to queue
+            if depth < job['max_depth']:
+                for link in islice(links, 10):  # Limit links per page
+                    if link in visited_set or link in queued_set:
+                        continue
+                    if len(queued_set) < 100:
+                        queued_set.add(link)
+                        new_entries.append({
+                            'job_id': job_id,
+                            'url': link,
+                            'depth': depth + 1,
+                            'parent': url
                         })
 
-                        # Save to pages collection
-                        await self._save_page(url, page_data, depth, parent, job['start_url'])
-
-                        # Add new links to queue
-                        if depth < job['max_depth']:
-                            for link in links[:10]:  # Limit links per page
-                                if link not in job['visited'] and len(job['queue']) < 100:
-                                    job['queue'].append({
-                                        'url': link,
-                                        'depth': depth + 1,
-                                        'parent': url
-                                    })
-                    else:
-                        job['nodes'][-1]['status'] = 'error'
-
-                except Exception as e:
-                    job['nodes'][-1]['status'] = 'error'
-                    print(f"Error crawling {url}: {e}")
-
-                processed += 1
+        # Save all pages of the batch in one round-trip
+        await self._save_pages(page_ops)
+        if new_entries:
+            await self.queue_collection.insert_many(new_entries)
 
         # Update stats
         duration = time.time() - start_time
-        job['stats'].update({
-            'total_pages': len(job['visited']),
-            'completed_pages': len([n for n in job['nodes'] if n['status'] == 'completed']),
-            'queue_size': len(job['queue']),
-            'duration': job['stats']['duration'] + duration
-        })
-
-        # Check if job is complete
-        if not job['queue'] or len(job['visited']) >= job['max_pages']:
-            job['status'] = 'completed'
+        completed = sum(1 for n in new_nodes if n['status'] == 'completed')
+
+        # Check if job is complete, from the queue as it stands after this
+        # batch's inserts rather than from a count another batch may have changed
+        if len(job['visited']) >= job['max_pages']:
+            status = 'completed'
+            await self.queue_collection.delete_many({'job_id': job_id})
+        elif not await self.queue_collection.find_one({'job_id': job_id}, projection={'_id': 1}):
+            status = 'completed'
         else:
-            job['status'] = 'pending'
-
-        # Save job state
-        await self.jobs_collection.update_one(
+            status = 'pending'
+
+        # Save job state; the queue size moves by this batch's net change
+        # unless the job is done and its queue empty
+        updates = {'status': status, 'updated_at': datetime.utcnow()}
+        increments = {
+            'stats.total_pages': len(new_visited),
+            'stats.completed_pages': completed,
+            'stats.duration': duration
+        }
+        if status == 'completed':
+            updates['stats.queue_size'] = 0
+        else:
+            increments['stats.queue_size'] = len(requeue) + len(new_entries) - dequeued
+        return await self.jobs_collection.find_one_and_update(
             {'job_id': job_id},
             {
-                '$set': {
-                    'status': job['status'],
-                    'updated_at': datetime.utcnow(),
-                    'stats': job['stats'],
-                    'queue': job['queue'],
-                    'visited': job['visited'],
-                    'nodes': job['nodes']
-                }
-            }
+                '$set': updates,
+                '$inc': increments,
+                '$addToSet': {'visited': {'$each': new_visited}},
+                '$push': {'nodes': {'$each': new_nodes}}
+            },
+            return_document=ReturnDocument.AFTER
         )
 
-        return job
-
-    async def _crawl_page(self, url, depth, session, base_url):
+    async def _crawl_page(self, url, depth, session, base_netloc):
         """Crawl a single page"""
         try:
-            async with session.get(url, timeout=5) as response:
+            async with session.get(url, timeout=REQUEST_TIMEOUT, headers=REQUEST_HEADERS) as response:
                 if response.status != 200:
                     return None, []
 
-                html = await response.text()
-                soup = BeautifulSoup(html, 'html.parser')
-
-                # Extract title
-                title = soup.find('title')
-                title_text = title.string.strip() if title else url
-
-                # Remove script and style elements
-                for script in soup(['script', 'style', 'noscript']):
-                    script.decompose()
-
-                # Get limited text content
-                text = soup.get_text()[:5000]
-                lines = (line.strip() for line in text.splitlines())
-                chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                full_text = ' '.join(chunk for chunk in chunks if chunk)[:5000]
-
-                # Extract snippet
-                meta_desc = soup.find('meta', attrs={'name': 'description'})
-                snippet = meta_desc.get('content', '')[:200] if meta_desc else full_text[:200]
-
-                # Extract links (limit to 20)
-                links = []
-                for link in soup.find_all('a', href=True)[:20]:
-                    absolute_url = urljoin(url, link['href'])
-                    if self._is_valid_url(absolute_url, base_url):
-                        links.append(absolute_url)
+                # Only the first few KB of text are kept, so never pull huge pages
+                if int(response.headers.get('Content-Length') or 0) > MAX_PAGE_BYTES:
+                    return None, []
 
-                return {
-                    'title': title_text,
-                    'text': full_text,
-                    'snippet': snippet
-                }, links
+                raw = await response.content.read(MAX_PAGE_BYTES)
+                html = raw.decode(response.charset or 'utf-8', errors='replace')
+                if SELECTOLAX_AVAILABLE:
+                    return self._parse_page_selectolax(html, url, base_netloc)
+                return self._parse_page_soup(html, url, base_netloc)
 
         except Exception as e:
             print(f"Error crawling {url}: {e}")
             return None, []
 
-    def _is_valid_url(self, url, base_url):
+    def _parse_page_selectolax(self, html, url, base_netloc):
+        """Extract title, text, snippet and links with selectolax's C parser"""
+        tree = HTMLParser(html)
+
+        # Extract title
+        title = tree.css_first('title')
+        title_text = (title.text(strip=True) if title else '') or url
+
+        # Remove script and style elements
+        tree.strip_tags(['script', 'style', 'noscript'])
+
+        # Get limited text content
+        body = tree.body or tree.root
+        text = (body.text(separator=' ') if body else '')[:5000]
+
+        # Extract snippet
+        meta_desc = tree.css_first('meta[name="description"]')
+        description = (meta_desc.attributes.get('content') or '') if meta_desc else ''
+        full_text, snippet = text_and_snippet(text, description)
+
+        # Extract links (limit to 20)
+        hrefs = (link.attributes.get('href') for link in tree.css('a[href]'))
+        links = self._collect_links(url, hrefs, base_netloc)
+
+        return {
+            'title': title_text,
+            'text': full_text,
+            'snippet': snippet
+        }, links
+
+    def _parse_page_soup(self, html, url, base_netloc):
+        """Extract title, text, snippet and links with BeautifulSoup"""
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Extract title
+        title = soup.find('title')
+        title_text = title.string.strip() if title else url
+
+        # Remove script and style elements
+        for script in soup(['script', 'style', 'noscript']):
+            script.decompose()
+
+        # Get limited text content
+        text = soup.get_text()[:5000]
+
+        # Extract snippet
+        meta_desc = soup.find('meta', attrs={'name': 'description'})
+        description = meta_desc.get('content', '') if meta_desc else ''
+        full_text, snippet = text_and_snippet(text, description)
+
+        # Extract links (limit to 20), walking the tree lazily
+        hrefs = (tag.get('href') for tag in soup.descendants if tag.name == 'a')
+        links = self._collect_links(url, hrefs, base_netloc)
+
+        return {
+            'title': title_text,
+            'text': full_text,
+            'snippet': snippet
+        }, links
+
+    def _collect_links(self, url, hrefs, base_netloc):
+        """Resolve hrefs and keep the first MAX_LINKS same-domain links"""
+        absolute_urls = (urljoin(url, href) for href in hrefs if href)
+        valid = (u for u in absolute_urls if self._is_valid_url(u, base_netloc))
+        return list(islice(valid, MAX_LINKS))
+
+    def _is_valid_url(self, url, base_netloc):
         """Check if URL is valid and belongs to same domain"""
+        # Cheap reject before paying for a full parse
+        if not url.startswith('http'):
+            return False
         try:
             parsed = urlparse(url)
-            base_parsed = urlparse(base_url)
             return (
                 parsed.scheme in ('http', 'https') and
-                parsed.netloc == base_parsed.netloc
+                parsed.netloc == base_netloc
             )
         except:
             return False
 
-    async def _save_page(self, url, page_data, depth, parent, start_url):
-        """Save page to MongoDB"""
+    def _page_upsert(self, url, page_data, depth, parent, start_url):
+        """Build an upsert that inserts the page only if its URL is new"""
+        return UpdateOne(
+            {'url': url},
+            {'$setOnInsert': {
+                'url': url,
+                'title': page_data['title'],
+                'text': page_data['text'],
+                'snippet': page_data['snippet'],
+                'token_counts': page_token_counts(page_data['title'], page_data['text'], page_data['snippet']),
+                'depth': depth,
+                'parent_url': parent,
+                'crawled_at': datetime.utcnow(),
+                'start_url': start_url
+            }},
+            upsert=True
+        )
+
+    async def _save_pages(self, page_ops):
+        """Save pages to MongoDB"""
+        if not page_ops:
+            return
         try:
-            existing = await self.pages_collection.find_one({'url': url})
-            if not existing:
-                await self.pages_collection.insert_one({
-                    'url': url,
-                    'title': page_data['title'],
-                    'text': page_data['text'],
-                    'snippet': page_data['snippet'],
-                    'depth': depth,
-                    'parent_url': parent,
-                    'crawled_at': datetime.utcnow(),
-                    'start_url': start_url
-                })
+            await self.pages_collection.bulk_write(page_ops, ordered=False)
+        except BulkWriteError as e:
+            # Duplicate URLs raced in by another crawler are expected
+            errors = [err for err in e.details.get('writeErrors', []) if err.get('code') != 11000]
+            if errors:
+                print(f"Error saving pages: {errors}")
         except Exception as e:
-            print(f"Error saving page {url}: {e}")
+            print(f"Error saving pages: {e}")
 
     async def cleanup_old_jobs(self, days=7):
         """Clean up old completed jobs"""
+        await self._ensure_indexes()
         cutoff = datetime.utcnow() - timedelta(days=days)
         await self.jobs_collection.delete_many({
             'status': 'completed',
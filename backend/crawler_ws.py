@@ -7,224 +7,334 @@ import asyncio
 import json
 import time
 import os
-from urllib.parse import urljoin, urlparse
-from collections import deque
-from bs4 import BeautifulSoup
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
 import aiohttp
 from flask_sock import Sock
 from datetime import datetime
 
+from crawl_config import LINKS_PER_DOC, text_and_snippet
+
 # MongoDB support (optional)
 try:
     from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo.errors import BulkWriteError
+    from mongo_search import page_token_counts
     MONGO_AVAILABLE = True
 except ImportError:
     MONGO_AVAILABLE = False
 
+# Faster JSON encoding for WebSocket messages (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def _dumps(data):
+    """Encode a WebSocket message as text, with orjson when available"""
+    # Decoded so the client still receives a text frame
+    return orjson.dumps(data).decode() if ORJSON_AVAILABLE else json.dumps(data)
+
+def _loads(data):
+    """Decode a WebSocket message"""
+    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+
+# Prefer the C-backed lxml parser; html.parser if libxml2 isn't installed
+try:
+    BeautifulSoup('', 'lxml')
+    SOUP_PARSER = 'lxml'
+except FeatureNotFound:
+    SOUP_PARSER = 'html.parser'
+
+# Worker tasks fetching in parallel per crawl; per-host politeness comes from the connector
+CONCURRENCY = 16
+# Upper bound for a client-requested concurrency
+MAX_CONCURRENCY = 32
+
+# Cap on bytes read from each response body
+MAX_PAGE_BYTES = 524288
+
+# Minimum seconds between 'stats' messages; completion is always sent
+STATS_INTERVAL = 0.1
+
+# Crawled pages buffered per insert_many call
+MONGO_BATCH_SIZE = 50
+
+# Concurrent background insert_many calls per crawl
+MONGO_MAX_INFLIGHT = 4
+
+# Seconds a crawl waits for the url index before going ahead without it
+INDEX_TIMEOUT = 10
+
+# Only build the tags we read; <body> is kept whole for the page text, while
+# <head> scripts, styles and links are never turned into tree nodes
+_STRAINER = SoupStrainer(['title', 'meta', 'a', 'body'])
+
+# Parsing runs in worker threads; lxml releases the GIL while it parses
+_PARSER_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix='crawler-parse')
+
+# hrefs that can never lead to a crawlable page
+_SKIP_HREF_PREFIXES = ('mailto:', 'javascript:', 'tel:')
+
+# Media types that are never HTML; anything else, including a missing
+# Content-Type, is parsed
+_NON_HTML_TYPES = ('image/', 'audio/', 'video/', 'font/', 'application/')
+_HTML_APPLICATION_TYPES = frozenset({'application/xhtml+xml'})
+
+def _is_html_type(content_type):
+    """False only for Content-Type values that are clearly not an HTML page"""
+    mime = content_type.split(';', 1)[0].strip().lower()
+    return mime in _HTML_APPLICATION_TYPES or not mime.startswith(_NON_HTML_TYPES)
+
+def _is_valid_url(url, base_netloc):
+    """Check if URL is valid and belongs to the same domain"""
+    if not url.startswith(('http://', 'https://')):
+        return False
+    try:
+        return urlsplit(url).netloc == base_netloc
+    except ValueError:
+        return False
+
+def _parse_html(html, page_url, base_netloc):
+    """Extract title, text, snippet and same-domain links from a page"""
+    soup = BeautifulSoup(html, SOUP_PARSER, parse_only=_STRAINER)
+
+    # Extract title
+    title = soup.find('title')
+    title_text = title.string.strip() if title else page_url
+
+    # Extract snippet
+    meta_desc = soup.find('meta', attrs={'name': 'description'})
+    snippet = meta_desc.get('content', '')[:200] if meta_desc else ''
+
+    # Extract limited text content to save memory
+    # Remove script and style elements
+    for script in soup(['script', 'style', 'noscript']):
+        script.decompose()
+
+    # Get text content (limit to first 5000 chars to save memory)
+    text = soup.get_text()[:5000]
+
+    full_text, snippet = text_and_snippet(text, snippet)
+
+    # Extract links (limit to LINKS_PER_DOC to save memory); already-visited URLs are
+    # filtered by the crawler when it enqueues them
+    links = []
+    for link in soup.find_all('a', href=True, limit=LINKS_PER_DOC):
+        href = link['href']
+        if not href or href[0] == '#' or href.startswith(_SKIP_HREF_PREFIXES):
+            continue
+        absolute_url = urljoin(page_url, href)
+        if _is_valid_url(absolute_url, base_netloc):
+            links.append(absolute_url)
+
+    result = {
+        'title': title_text,
+        'text': full_text,
+        'snippet': snippet,
+        'links': links
+    }
+    return result, links
+
 class WebCrawler:
-    def __init__(self, start_url, max_depth=2, max_pages=100, save_to_mongo=False, mongo_client=None):
+    def __init__(self, start_url, max_depth=2, max_pages=100, save_to_mongo=False, mongo_client=None, session=None, concurrency=CONCURRENCY):
         self.start_url = start_url
+        self.concurrency = max(1, min(int(concurrency), MAX_CONCURRENCY))
+        self._base_netloc = urlsplit(start_url).netloc
         self.max_depth = max_depth
         self.max_pages = min(max_pages, 50)  # Limit to 50 pages max on low memory
         self.visited = set()
-        self.queue = deque([(start_url, 0, None)])  # (url, depth, parent_url)
+        self.queue = None  # asyncio.Queue, created on the crawl's event loop
         self.start_time = time.time()
         self.save_to_mongo = save_to_mongo and MONGO_AVAILABLE
         self.mongo_client = mongo_client
         self.db = None
-        self.page_count = 0
+        self.collection = None
+        self._pending_docs = []
+        self._mongo_tasks = []  # background insert_many tasks
+        self._last_stats_t = 0.0
+        self.session = session  # shared aiohttp session; a private one is opened if None
 
         if self.save_to_mongo and mongo_client:
             self.db = mongo_client.crawler_db
             self.collection = self.db.crawled_pages
 
-    def is_valid_url(self, url, base_domain):
-        """Check if URL is valid and belongs to the same domain"""
-        try:
-            parsed = urlparse(url)
-            base_parsed = urlparse(base_domain)
-            return (
-                parsed.scheme in ('http', 'https') and
-                parsed.netloc == base_parsed.netloc and
-                url not in self.visited
-            )
-        except:
-            return False
-
     async def crawl_page(self, url, depth, session):
         """Crawl a single page and extract links"""
         try:
             async with session.get(url, timeout=10) as response:
                 if response.status != 200:
                     return None, []
+                if not _is_html_type(response.headers.get('Content-Type', '')):
+                    return None, []
 
-                html = await response.text()
-                soup = BeautifulSoup(html, 'html.parser')
-
-                # Extract title
-                title = soup.find('title')
-                title_text = title.string.strip() if title else url
-
-                # Extract limited text content to save memory
-                # Remove script and style elements
-                for script in soup(['script', 'style', 'noscript']):
-                    script.decompose()
-
-                # Get text content (limit to first 5000 chars to save memory)
-                text = soup.get_text()[:5000]
-                # Clean up whitespace
-                lines = (line.strip() for line in text.splitlines())
-                chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                full_text = ' '.join(chunk for chunk in chunks if chunk)[:5000]
-
-                # Extract snippet
-                meta_desc = soup.find('meta', attrs={'name': 'description'})
-                snippet = meta_desc.get('content', '')[:200] if meta_desc else ''
-
-                # Extract text content for snippet if no meta description
-                if not snippet:
-                    # Use first 200 chars of full text
-                    snippet = full_text[:200] if full_text else ''
-
-                # Extract links (limit to 20 to save memory)
-                links = []
-                for link in soup.find_all('a', href=True)[:20]:
-                    absolute_url = urljoin(url, link['href'])
-                    if self.is_valid_url(absolute_url, self.start_url):
-                        links.append(absolute_url)
-
-                result = {
-                    'title': title_text,
-                    'text': full_text,
-                    'snippet': snippet,
-                    'links': links
-                }
-
-                # Clear soup to free memory
-                del soup
-                del html
+                # Only the first MAX_PAGE_BYTES are ever used downstream
+                raw = await response.content.read(MAX_PAGE_BYTES)
+                html = raw.decode(response.charset or 'utf-8', errors='replace')
 
-                return result, links
+            # Parse off the event loop so other fetches keep making progress
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_PARSER_POOL, _parse_html, html, url, self._base_netloc)
         except Exception as e:
             print(f"Error crawling {url}: {e}")
             return None, []
 
-    def _send_ws(self, ws, data):
-        """Helper to send WebSocket data synchronously"""
-        try:
-            ws.send(json.dumps(data))
-        except Exception as e:
-            print(f"WebSocket send error: {e}")
+    def _send_ws(self, frames, data):
+        """Queue a WebSocket message; the request thread sends it, so a slow
+        client never blocks the shared crawler loop"""
+        frames.put(_dumps(data))
+
+    async def _crawl_one(self, url, depth, parent_url, session, frames):
+        """Fetch and report one page; returns its links or None on error"""
+        print(f"Crawling (depth {depth}): {url}")
+
+        # Send crawling status
+        self._send_ws(frames, {
+            'type': 'node',
+            'node': {
+                'url': url,
+                'depth': depth,
+                'status': 'crawling',
+                'parent': parent_url
+            }
+        })
 
-    async def crawl(self, ws):
-        """Main crawl loop with WebSocket updates"""
-        async with aiohttp.ClientSession() as session:
-            while self.queue and len(self.visited) < self.max_pages:
-                url, depth, parent_url = self.queue.popleft()
+        # Crawl the page
+        page_data, links = await self.crawl_page(url, depth, session)
+
+        if not page_data:
+            # Send error status
+            self._send_ws(frames, {
+                'type': 'node',
+                'node': {
+                    'url': url,
+                    'depth': depth,
+                    'status': 'error',
+                    'parent': parent_url
+                }
+            })
+            return None
+
+        # Send completed status
+        self._send_ws(frames, {
+            'type': 'node',
+            'node': {
+                'url': url,
+                'depth': depth,
+                'status': 'completed',
+                'title': page_data['title'],
+                'linkCount': len(links),
+                'parent': parent_url
+            }
+        })
 
-                if url in self.visited or depth > self.max_depth:
+        # Queue for MongoDB if enabled; written in batches
+        if self.save_to_mongo and self.collection is not None:
+            self._pending_docs.append({
+                'url': url,
+                'title': page_data['title'],
+                'text': page_data.get('text', ''),
+                'snippet': page_data['snippet'],
+                # Index builds read these instead of re-tokenizing the text
+                'token_counts': page_token_counts(page_data['title'], page_data.get('text', ''), page_data['snippet']),
+                'depth': depth,
+                'parent_url': parent_url,
+                'link_count': len(links),
+                'links': links,
+                'crawled_at': datetime.utcnow(),
+                'start_url': self.start_url
+            })
+            if len(self._pending_docs) >= MONGO_BATCH_SIZE:
+                # Write in the background so the next fetch isn't held up by Mongo
+                self._mongo_tasks.append(asyncio.create_task(self._flush_pages()))
+
+        return links
+
+    async def _flush_pages(self):
+        """Insert pending pages in one round-trip; existing URLs are skipped by the unique index"""
+        if not self._pending_docs:
+            return
+        docs, self._pending_docs = self._pending_docs, []
+        try:
+            async with self._mongo_sem:
+                result = await self.collection.insert_many(docs, ordered=False, bypass_document_validation=True)
+            print(f"✓ Saved {len(result.inserted_ids)} pages to MongoDB")
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            if any(err.get('code') != 11000 for err in errors):
+                print(f"MongoDB error: {e}")
+            else:
+                print(f"✓ Saved {e.details.get('nInserted', 0)} pages to MongoDB")
+        except Exception as e:
+            print(f"MongoDB error: {e}")
+
+    async def _worker(self, session, frames):
+        """Take URLs off the queue and crawl them until cancelled"""
+        while True:
+            url, depth, parent_url = await self.queue.get()
+            try:
+                if url in self.visited or depth > self.max_depth or len(self.visited) >= self.max_pages:
                     continue
 
+                # Mark visited before fetching so no other worker picks it up
                 self.visited.add(url)
-
-                print(f"Crawling (depth {depth}): {url}")
-
-                # Send crawling status
-                self._send_ws(ws, {
-                    'type': 'node',
-                    'node': {
-                        'url': url,
-                        'depth': depth,
-                        'status': 'crawling',
-                        'parent': parent_url
-                    }
-                })
-
-                # Crawl the page
-                page_data, links = await self.crawl_page(url, depth, session)
-
-                if page_data:
-                    # Send completed status
-                    self._send_ws(ws, {
-                        'type': 'node',
-                        'node': {
-                            'url': url,
-                            'depth': depth,
-                            'status': 'completed',
-                            'title': page_data['title'],
-                            'linkCount': len(links),
-                            'parent': parent_url
+                links = await self._crawl_one(url, depth, parent_url, session, frames)
+
+                # Add new links to queue (limit queue size)
+                for link in links or ():
+                    if link not in self.visited and self.queue.qsize() < 100:
+                        self.queue.put_nowait((link, depth + 1, url))
+
+                # Send stats update, at most once per STATS_INTERVAL
+                now = time.time()
+                if now - self._last_stats_t >= STATS_INTERVAL:
+                    self._last_stats_t = now
+                    self._send_ws(frames, {
+                        'type': 'stats',
+                        'stats': {
+                            'totalPages': len(self.visited),
+                            'completedPages': len(self.visited),
+                            'queueSize': self.queue.qsize(),
+                            'duration': now - self.start_time,
+                            'status': 'crawling'
                         }
                     })
-
-                    # Save to MongoDB if enabled
-                    if self.save_to_mongo and self.collection is not None:
-                        try:
-                            # Check if URL already exists
-                            existing = await self.collection.find_one({'url': url})
-                            if existing:
-                                # Silently skip - document already exists
-                                pass
-                            else:
-                                # Insert new document
-                                await self.collection.insert_one({
-                                    'url': url,
-                                    'title': page_data['title'],
-                                    'text': page_data.get('text', ''),
-                                    'snippet': page_data['snippet'],
-                                    'depth': depth,
-                                    'parent_url': parent_url,
-                                    'link_count': len(links),
-                                    'links': links[:50],
-                                    'crawled_at': datetime.utcnow(),
-                                    'start_url': self.start_url
-                                })
-                                print(f"✓ Saved to MongoDB: {url}")
-                        except Exception as e:
-                            print(f"MongoDB error for {url}: {e}")
-
-                    # Add new links to queue (limit queue size)
-                    for link in links:
-                        if link not in self.visited and len(self.queue) < 100:
-                            self.queue.append((link, depth + 1, url))
-
-                    # Periodically clear old data to save memory
-                    self.page_count += 1
-                    if self.page_count % 10 == 0:
-                        # Keep only recent visited URLs
-                        if len(self.visited) > 100:
-                            self.visited = set(list(self.visited)[-50:])
-                else:
-                    # Send error status
-                    self._send_ws(ws, {
-                        'type': 'node',
-                        'node': {
-                            'url': url,
-                            'depth': depth,
-                            'status': 'error',
-                            'parent': parent_url
-                        }
-                    })
-
-                # Send stats update
-                duration = time.time() - self.start_time
-                self._send_ws(ws, {
-                    'type': 'stats',
-                    'stats': {
-                        'totalPages': len(self.visited),
-                        'completedPages': len(self.visited),
-                        'queueSize': len(self.queue),
-                        'duration': duration,
-                        'status': 'crawling'
-                    }
-                })
-
-                # Small delay to prevent overwhelming
-                await asyncio.sleep(0.1)
+            except Exception as e:
+                print(f"Error crawling {url}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def crawl(self, frames):
+        """Main crawl loop; WebSocket updates are put on the frames queue"""
+        owns_session = self.session is None
+        # Standalone crawls still get the pooled keep-alive connector
+        session = await _create_session() if owns_session else self.session
+        self.queue = asyncio.Queue()
+        self._mongo_sem = asyncio.Semaphore(MONGO_MAX_INFLIGHT)
+        self.queue.put_nowait((self.start_url, 0, None))  # (url, depth, parent_url)
+
+        # Workers skip whatever is left once max_pages is reached, so the
+        # queue always drains
+        workers = [asyncio.create_task(self._worker(session, frames)) for _ in range(self.concurrency)]
+        try:
+            await self.queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if self.save_to_mongo and self.collection is not None:
+                await self._flush_pages()
+                await asyncio.gather(*self._mongo_tasks, return_exceptions=True)
+            if owns_session:
+                await session.close()
 
         # Send completion
         duration = time.time() - self.start_time
-        self._send_ws(ws, {
+        self._send_ws(frames, {
             'type': 'complete',
             'stats': {
                 'totalPages': len(self.visited),
@@ -235,10 +345,31 @@ class WebCrawler:
             }
         })
 
+async def _create_session():
+    """Create the pooled HTTP session (must run on the crawler loop)"""
+    connector = aiohttp.TCPConnector(
+        limit=512,
+        limit_per_host=16,
+        ttl_dns_cache=300,
+        keepalive_timeout=60
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=10),
+        read_bufsize=65536
+    )
+
 def setup_crawler_websocket(app):
     """Setup WebSocket endpoint for crawler"""
     sock = Sock(app)
 
+    # One long-lived event loop and HTTP session shared by every crawl, so
+    # the connection pool survives across WebSocket sessions
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name='crawler-loop', daemon=True).start()
+    session = asyncio.run_coroutine_threadsafe(_create_session(), loop).result()
+    app.extensions['crawler_session'] = session
+
     # Setup MongoDB connection if available
     mongo_client = None
     if MONGO_AVAILABLE:
@@ -249,44 +380,80 @@ def setup_crawler_websocket(app):
         except Exception as e:
             print(f"⚠ MongoDB connection failed: {e}")
 
+    # Unique url index lets batched inserts skip existing pages server-side.
+    # Created by the first crawl that saves pages rather than at import, so
+    # startup never waits on MongoDB
+    url_index_ready = False
+
+    def ensure_url_index():
+        nonlocal url_index_ready
+        if url_index_ready:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(
+                mongo_client.crawler_db.crawled_pages.create_index('url', unique=True),
+                loop
+            ).result(timeout=INDEX_TIMEOUT)
+            url_index_ready = True
+        except Exception as e:
+            print(f"⚠ MongoDB index creation failed: {e}")
+
     @sock.route('/ws/crawl')
     def crawl_websocket(ws):
         """WebSocket endpoint for real-time crawling"""
         try:
             # Wait for start message
             data = ws.receive()
-            config = json.loads(data)
+            config = _loads(data)
 
             if config.get('action') == 'start':
                 start_url = config.get('url')
                 max_depth = config.get('maxDepth', 2)
                 max_pages = config.get('maxPages', 100)
                 save_to_mongo = config.get('saveToMongo', False)
+                concurrency = config.get('concurrency', CONCURRENCY)
 
                 print(f"Starting crawl: {start_url}, depth={max_depth}, pages={max_pages}")
 
+                if save_to_mongo and mongo_client is not None:
+                    ensure_url_index()
+
                 # Create and run crawler
                 crawler = WebCrawler(
                     start_url,
                     max_depth,
                     max_pages,
                     save_to_mongo=save_to_mongo,
-                    mongo_client=mongo_client
+                    mongo_client=mongo_client,
+                    session=session,
+                    concurrency=concurrency
                 )
 
-                # Run async crawler in event loop
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    loop.run_until_complete(crawler.crawl(ws))
-                finally:
-                    loop.close()
+                # Run async crawler on the shared event loop and relay its
+                # messages from this thread until it finishes
+                frames = queue.Queue()
+                future = asyncio.run_coroutine_threadsafe(crawler.crawl(frames), loop)
+                future.add_done_callback(lambda _: frames.put(None))
+                client_gone = False
+                while (frame := frames.get()) is not None:
+                    if client_gone:
+                        continue
+                    try:
+                        ws.send(frame)
+                    except Exception as e:
+                        # Stop crawling for a closed client; keep draining
+                        # until the crawl has wound down
+                        print(f"WebSocket send error: {e}")
+                        client_gone = True
+                        future.cancel()
+                if not future.cancelled():
+                    future.result()
 
         except Exception as e:
             print(f"Crawl error: {e}")
             import traceback
             traceback.print_exc()
-            ws.send(json.dumps({
+            ws.send(_dumps({
                 'type': 'error',
                 'message': str(e)
             }))
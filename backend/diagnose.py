@@ -3,22 +3,30 @@
 Diagnostic tool to check data sources and help troubleshoot
 """
 
+import functools
 import os
 import sys
 from pathlib import Path
 
+# Load .env file once for every check
+try:
+    from load_env import load_env
+    load_env()
+except:
+    pass
+
+@functools.lru_cache(maxsize=1)
+def _engine(mongodb_uri):
+    """Shared search engine; fails fast if MongoDB is unreachable"""
+    from mongo_search import MongoSearchEngine
+    return MongoSearchEngine(mongodb_uri, serverSelectionTimeoutMS=2000)
+
 def check_env():
     """Check environment configuration"""
     print("=" * 60)
     print("🔧 Environment Configuration")
     print("=" * 60)
 
-    try:
-        from load_env import load_env
-        load_env()
-    except:
-        pass
-
     mongodb_uri = os.environ.get('MONGODB_URI', 'NOT SET')
     use_mongodb = os.environ.get('USE_MONGODB', 'NOT SET')
     data_dir = os.environ.get('DATA_DIR', './data')
@@ -34,17 +42,10 @@ def check_mongodb():
     print("🗄️  MongoDB Status")
     print("=" * 60)
 
-    try:
-        from load_env import load_env
-        load_env()
-    except:
-        pass
-
     mongodb_uri = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/')
 
     try:
-        from mongo_search import MongoSearchEngine
-        engine = MongoSearchEngine(mongodb_uri)
+        engine = _engine(mongodb_uri)
         stats = engine.get_stats()
 
         print(f"✓ Connection: SUCCESS")
@@ -64,7 +65,6 @@ def check_mongodb():
             print()
             print("✅ MongoDB has data and is ready to use!")
 
-        engine.close()
         return stats['total_docs'] > 0
 
     except Exception as e:
@@ -0,0 +1,23 @@
+"""
+Gunicorn settings for running the backend in production
+Usage: gunicorn -c gunicorn_conf.py server:app
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Threaded workers: requests spend most of their time waiting on MongoDB,
+# and the crawler WebSocket holds a thread for the length of a crawl.
+# GUNICORN_WORKER_CLASS=gevent suits many idle connections, but gevent's
+# monkey-patching doesn't mix with the crawler jobs' asyncio loop thread
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * (os.cpu_count() or 1) + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Each worker builds its own search index and Mongo clients after the fork
+preload_app = False
+
+timeout = 60
+accesslog = '-'
@@ -3,11 +3,31 @@
 Import existing crawled data into MongoDB
 """
 
+import asyncio
+import functools
 import json
 import os
 import sys
 from datetime import datetime
-from pymongo import MongoClient
+from itertools import islice
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+
+from crawl_config import LINKS_PER_DOC
+from mongo_search import page_token_counts
+
+# Faster JSON decoding (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Documents sent per insert_many call
+BATCH_SIZE = 1000
+
+# Page files read and decoded concurrently in worker threads
+READ_CONCURRENCY = 8
 
 # Load .env file if available
 try:
@@ -16,7 +36,60 @@ try:
 except:
     pass
 
-def import_to_mongodb(data_dir, mongo_uri=None):
+@functools.lru_cache(maxsize=1)
+def _client(mongo_uri):
+    """Shared Motor client; fails fast if MongoDB is unreachable"""
+    return AsyncIOMotorClient(mongo_uri, serverSelectionTimeoutMS=2000)
+
+def iter_page_files(pages_dir):
+    """Yield page JSON paths lazily; import order doesn't matter"""
+    with os.scandir(pages_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith('.json'):
+                yield entry.path
+
+def read_json(path):
+    """Load one JSON file, with orjson when available"""
+    if ORJSON_AVAILABLE:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def load_document(path, start_url, crawled_at):
+    """Read one page file and build its MongoDB document (runs in a worker thread)"""
+    page = read_json(path)
+    links = page.get('links', [])
+    title = page.get('title', 'Untitled')
+    text = page.get('text', '')
+    snippet = page.get('snippet', '')
+    return {
+        'url': page.get('url', ''),
+        'title': title,
+        'text': text,  # Store full text content
+        'snippet': snippet[:500],  # Limit snippet size
+        'token_counts': page_token_counts(title, text, snippet[:200]),  # Read by index builds
+        'depth': page.get('depth', 0),
+        'parent_url': page.get('parent_url', None),
+        'link_count': len(links),
+        'links': links[:LINKS_PER_DOC],  # Page files can hold more links than we store
+        'length': page.get('length', 0),
+        'crawled_at': crawled_at,
+        'start_url': start_url,
+        'imported_at': datetime.utcnow()
+    }
+
+async def insert_batch(collection, documents):
+    """Insert a batch, skipping pages whose url is already stored; returns the number inserted"""
+    try:
+        result = await collection.insert_many(documents, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+            raise
+        return e.details.get('nInserted', 0)
+
+async def import_to_mongodb(data_dir, mongo_uri=None):
     """Import crawled pages from JSON files into MongoDB"""
 
     # Use environment variable if not explicitly provided
@@ -25,12 +98,12 @@ def import_to_mongodb(data_dir, mongo_uri=None):
 
     print(f"🔌 Connecting to MongoDB: {mongo_uri[:50]}..." if len(mongo_uri) > 50 else f"🔌 Connecting to MongoDB: {mongo_uri}")
     try:
-        client = MongoClient(mongo_uri)
+        client = _client(mongo_uri)
         db = client.crawler_db
         collection = db.crawled_pages
 
         # Test connection
-        client.admin.command('ping')
+        await client.admin.command('ping')
         print("✓ Connected to MongoDB")
     except Exception as e:
         print(f"❌ Failed to connect to MongoDB: {e}")
@@ -44,8 +117,7 @@ def import_to_mongodb(data_dir, mongo_uri=None):
         print(f"❌ crawl_meta.json not found in {data_dir}")
         sys.exit(1)
 
-    with open(crawl_meta_path, 'r') as f:
-        crawl_meta = json.load(f)
+    crawl_meta = read_json(crawl_meta_path)
 
     start_url = crawl_meta.get('start_url', 'unknown')
     print(f"📊 Crawl source: {start_url}")
@@ -57,56 +129,61 @@ def import_to_mongodb(data_dir, mongo_uri=None):
         print(f"❌ pages directory not found in {data_dir}")
         sys.exit(1)
 
-    page_files = sorted([f for f in os.listdir(pages_dir) if f.endswith('.json')])
-    print(f"📄 Found {len(page_files)} pages to import")
-
     # Clear existing data for this crawl (optional)
     print(f"🧹 Clearing existing data for {start_url}...")
-    collection.delete_many({'start_url': start_url})
+    await collection.delete_many({'start_url': start_url})
 
-    # Import pages
-    documents = []
+    # Unique url index up front so re-imported pages are rejected by the server
+    try:
+        await collection.create_index('url', unique=True)
+    except Exception as e:
+        print(f"⚠ Could not create unique url index: {e}")
+
+    crawled_at = datetime.fromisoformat(crawl_meta['timestamp']) if 'timestamp' in crawl_meta else datetime.utcnow()
+
+    # Import pages: worker threads read and decode files while a single
+    # writer sends full batches, so disk, CPU and network overlap
+    queue = asyncio.Queue(maxsize=BATCH_SIZE * 2)
     imported = 0
     errors = 0
 
-    print("📥 Importing pages...")
-    for i, filename in enumerate(page_files):
-        try:
-            with open(os.path.join(pages_dir, filename), 'r') as f:
-                page = json.load(f)
-
-            # Create MongoDB document
-            doc = {
-                'url': page.get('url', ''),
-                'title': page.get('title', 'Untitled'),
-                'text': page.get('text', ''),  # Store full text content
-                'snippet': page.get('snippet', '')[:500],  # Limit snippet size
-                'depth': page.get('depth', 0),
-                'parent_url': page.get('parent_url', None),
-                'link_count': len(page.get('links', [])),
-                'links': page.get('links', [])[:50],  # Store first 50 links
-                'length': page.get('length', 0),
-                'crawled_at': datetime.fromisoformat(crawl_meta['timestamp']) if 'timestamp' in crawl_meta else datetime.utcnow(),
-                'start_url': start_url,
-                'imported_at': datetime.utcnow()
-            }
-
+    async def read_pages():
+        nonlocal errors
+        paths = iter_page_files(pages_dir)
+        while True:
+            chunk = list(islice(paths, READ_CONCURRENCY))
+            if not chunk:
+                break
+            docs = await asyncio.gather(
+                *(asyncio.to_thread(load_document, path, start_url, crawled_at) for path in chunk),
+                return_exceptions=True
+            )
+            for path, doc in zip(chunk, docs):
+                if isinstance(doc, Exception):
+                    errors += 1
+                    print(f"  ⚠ Error importing {os.path.basename(path)}: {doc}")
+                else:
+                    await queue.put(doc)
+        await queue.put(None)
+
+    async def write_pages():
+        nonlocal imported
+        documents = []
+        while (doc := await queue.get()) is not None:
             documents.append(doc)
-            imported += 1
 
-            # Batch insert every 100 documents
-            if len(documents) >= 100:
-                collection.insert_many(documents)
+            # Batch insert every BATCH_SIZE documents
+            if len(documents) >= BATCH_SIZE:
+                imported += await insert_batch(collection, documents)
                 documents = []
-                print(f"  ✓ Imported {imported}/{len(page_files)} pages", end='\r')
+                print(f"  ✓ Imported {imported} pages", end='\r')
 
-        except Exception as e:
-            errors += 1
-            print(f"  ⚠ Error importing {filename}: {e}")
+        # Insert remaining documents
+        if documents:
+            imported += await insert_batch(collection, documents)
 
-    # Insert remaining documents
-    if documents:
-        collection.insert_many(documents)
+    print("📥 Importing pages...")
+    await asyncio.gather(read_pages(), write_pages())
 
     print(f"\n✅ Import complete!")
     print(f"   Imported: {imported} pages")
@@ -115,15 +192,14 @@ def import_to_mongodb(data_dir, mongo_uri=None):
 
     # Create indexes for better performance
     print("\n🔧 Creating indexes...")
-    collection.create_index('url')
-    collection.create_index('start_url')
-    collection.create_index('depth')
-    collection.create_index('crawled_at')
+    await collection.create_index('start_url')
+    await collection.create_index('depth')
+    await collection.create_index('crawled_at')
     print("✓ Indexes created")
 
     # Print summary
     print(f"\n📊 Database summary:")
-    total_docs = collection.count_documents({})
+    total_docs = await collection.count_documents({})
     print(f"   Total documents: {total_docs}")
     print(f"   This crawl: {imported}")
 
@@ -133,7 +209,7 @@ def import_to_mongodb(data_dir, mongo_uri=None):
         {'$group': {'_id': '$depth', 'count': {'$sum': 1}}},
         {'$sort': {'_id': 1}}
     ]
-    depth_counts = list(collection.aggregate(pipeline))
+    depth_counts = await collection.aggregate(pipeline).to_list(None)
     print(f"\n   Pages by depth:")
     for item in depth_counts:
         print(f"     Depth {item['_id']}: {item['count']} pages")
@@ -159,4 +235,4 @@ if __name__ == '__main__':
         print(f"❌ Data directory not found: {args.data_dir}")
         sys.exit(1)
 
-    import_to_mongodb(args.data_dir, args.mongo_uri)
+    asyncio.run(import_to_mongodb(args.data_dir, args.mongo_uri))
@@ -7,21 +7,24 @@ from pathlib import Path
 
 def load_env():
     """Load environment variables from .env file if it exists"""
+    # Several modules call this at import time; only parse the file once
+    if os.environ.get('_ENV_LOADED'):
+        return
+    os.environ['_ENV_LOADED'] = '1'
+
     env_file = Path(__file__).parent / '.env'
 
     if env_file.exists():
-        print(f"Loading environment from {env_file}")
-        with open(env_file) as f:
-            for line in f:
-                line = line.strip()
-                # Skip comments and empty lines
-                if line and not line.startswith('#'):
-                    if '=' in line:
-                        key, value = line.split('=', 1)
-                        # Only set if not already in environment
-                        if key not in os.environ:
-                            os.environ[key] = value
-                            print(f"  Set {key}")
+        count = 0
+        for line in env_file.read_text().splitlines():
+            line = line.strip()
+            # Skip comments and empty lines
+            if line and not line.startswith('#') and '=' in line:
+                key, value = line.split('=', 1)
+                # Only set if not already in environment; strip optional quotes
+                os.environ.setdefault(key.strip(), value.strip().strip('"\''))
+                count += 1
+        print(f"Loaded {count} env vars from {env_file}")
     else:
         print(f"No .env file found (using system environment variables)")
 
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Backfill token_counts on pages stored before the crawlers wrote them
+Index builds then read the counts instead of fetching and tokenizing text
+
+Also writes the pagerank/rank_length fields that MONGO_TEXT_SEARCH ranks
+with; run it again after crawls or imports to refresh them
+"""
+
+import os
+import sys
+from pymongo import MongoClient, UpdateOne
+
+from mongo_search import INDEX_BATCH_SIZE, MongoSearchEngine, page_token_counts
+
+# Load .env file if available
+try:
+    from load_env import load_env
+    load_env()
+except:
+    pass
+
+def migrate(mongo_uri, db_name='crawler_db'):
+    """Compute and store token_counts for every page that lacks them"""
+    client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+    collection = client[db_name].crawled_pages
+
+    cursor = collection.find(
+        {'token_counts': {'$exists': False}},
+        {'url': 1, 'title': 1, 'text': 1, 'snippet': 1}
+    ).batch_size(INDEX_BATCH_SIZE)
+
+    ops = []
+    updated = 0
+    for doc in cursor:
+        token_counts = page_token_counts(
+            doc.get('title', 'Untitled'),
+            doc.get('text', ''),
+            doc.get('snippet', '')[:200]
+        )
+        ops.append(UpdateOne({'_id': doc['_id']}, {'$set': {'token_counts': token_counts}}))
+        if len(ops) >= INDEX_BATCH_SIZE:
+            updated += collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+            print(f"  ✓ Updated {updated} pages", end='\r')
+
+    if ops:
+        updated += collection.bulk_write(ops, ordered=False).modified_count
+
+    print(f"\n✅ Added token_counts to {updated} pages")
+    client.close()
+    return updated
+
+def store_rank_fields(mongo_uri, db_name='crawler_db', force=False):
+    """Write rank fields for the text-search path if the collection changed since the last run"""
+    engine = MongoSearchEngine(mongo_uri, db_name, serverSelectionTimeoutMS=5000)
+    try:
+        written = engine.store_rank_fields(force=force)
+    finally:
+        engine.close()
+    if written:
+        print(f"✅ Stored rank fields on {written} pages")
+    else:
+        print("✓ Rank fields already up to date")
+    return written
+
+if __name__ == '__main__':
+    import argparse
+
+    default_mongo_uri = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/')
+
+    parser = argparse.ArgumentParser(description='Backfill token_counts on crawled pages')
+    parser.add_argument('--mongo-uri', default=default_mongo_uri, help='MongoDB connection URI (default: from MONGODB_URI env var or localhost)')
+    parser.add_argument('--db', default='crawler_db', help='Database name')
+    parser.add_argument('--force-rank-fields', action='store_true', help='Rewrite rank fields even if the collection is unchanged')
+
+    args = parser.parse_args()
+
+    try:
+        migrate(args.mongo_uri, args.db)
+        store_rank_fields(args.mongo_uri, args.db, force=args.force_rank_fields)
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
@@ -8,12 +8,46 @@ mini_search.py — debug TLS build
 """
 
 from __future__ import annotations
-import argparse, collections, contextlib, dataclasses, html, io, json, math, os, queue, random, re, sys, time
-import urllib.parse, urllib.request, urllib.error, urllib.robotparser
+import argparse, array, bisect, collections, concurrent.futures, contextlib, dataclasses, functools, heapq, html, io, json, math, mmap, operator, os, random, re, sys, time
+import http.client, threading, urllib.parse, urllib.request, urllib.error, urllib.robotparser
 from html.parser import HTMLParser
 from typing import Dict, List, Tuple, Iterable, Set, Optional
 import ssl
 
+# C-backed HTML parser (optional); falls back to the stdlib HTMLParser.
+# selectolax 1.0 removed the Modest backend, so prefer lexbor.
+try:
+    from selectolax.lexbor import LexborHTMLParser as FastHTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as FastHTMLParser
+        SELECTOLAX_AVAILABLE = True
+    except ImportError:
+        SELECTOLAX_AVAILABLE = False
+
+# Faster JSON (optional); falls back to the stdlib json module
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def read_json(path: str):
+    if ORJSON_AVAILABLE:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_json(path: str, obj):
+    if ORJSON_AVAILABLE:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS))
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False)
+
 def make_ssl_context(insecure: bool, verbose: bool) -> ssl.SSLContext:
     if insecure:
         if verbose:
@@ -35,10 +69,20 @@ def make_ssl_context(insecure: bool, verbose: bool) -> ssl.SSLContext:
         print("[tls] using system default CA bundle")
     return ssl.create_default_context()
 
+# URL helpers run once per outlink/enqueue, so memoize the urlsplit work
+URL_CACHE_SIZE = 200_000
+
 def norm_url(u: str, base: str | None = None) -> str:
-    try:
-        if base:
+    if base:
+        try:
             u = urllib.parse.urljoin(base, u)
+        except Exception:
+            return ""
+    return _norm_url_nobase(u)
+
+@functools.lru_cache(maxsize=URL_CACHE_SIZE)
+def _norm_url_nobase(u: str) -> str:
+    try:
         pu = urllib.parse.urlsplit(u)
         netloc = pu.netloc.lower()
         if (pu.scheme == "http" and netloc.endswith(":80")) or (pu.scheme == "https" and netloc.endswith(":443")):
@@ -50,6 +94,7 @@ def norm_url(u: str, base: str | None = None) -> str:
     except Exception:
         return ""
 
+@functools.lru_cache(maxsize=URL_CACHE_SIZE)
 def host_only(u: str) -> str:
     try:
         return urllib.parse.urlsplit(u).netloc.split(":")[0].lower()
@@ -62,33 +107,159 @@ def same_domain(a: str, b: str) -> bool:
     except Exception:
         return False
 
+# naive registrable domain: last two labels (good for .org/.com etc.)
+def reg_domain(h: str) -> str:
+    parts = h.split('.')
+    return '.'.join(parts[-2:]) if len(parts) >= 2 else h
+
 # include subdomains: *.root
 def same_reg_domain(a: str, b: str) -> bool:
     try:
-        ha, hb = host_only(a), host_only(b)
-        # naive registrable domain: last two labels (good for .org/.com etc.)
-        def root(h):
-            parts = h.split('.')
-            return '.'.join(parts[-2:]) if len(parts) >= 2 else h
-        return root(ha) == root(hb)
+        return reg_domain(host_only(a)) == reg_domain(host_only(b))
     except Exception:
         return False
 
-def sleep_polite(last_fetch_time: Dict[str, float], host: str, delay: float = 1.0):
-    now = time.time()
-    t = last_fetch_time.get(host, 0.0)
-    wait = (t + delay) - now
-    if wait > 0:
-        time.sleep(wait)
+# Minimum seconds between request starts to the same host
+POLITE_DELAY = 0.75
+
+# Per-host URL queues plus a heap of (next allowed fetch time, host): the
+# crawler takes from whichever host is ready soonest, so one cooling-down
+# host never stalls the others
+class HostFrontier:
+    def __init__(self, delay: float = POLITE_DELAY):
+        self.delay = delay
+        self.queues: Dict[str, collections.deque] = {}
+        self.heap: List[Tuple[float, str]] = []
+        self.scheduled: Set[str] = set()
+        self.last_fetch_time: Dict[str, float] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.heap)
+
+    def put(self, url: str, host: Optional[str] = None):
+        if host is None:
+            host = host_only(url)
+        dq = self.queues.get(host)
+        if dq is None:
+            dq = self.queues[host] = collections.deque()
+        dq.append(url)
+        if host not in self.scheduled:
+            self.scheduled.add(host)
+            heapq.heappush(self.heap, (self.last_fetch_time.get(host, -self.delay) + self.delay, host))
+
+    def next_ready_time(self) -> float:
+        return self.heap[0][0]
+
+    def pop(self) -> Tuple[str, str, float]:
+        """Take a URL from the soonest-ready host; pair with release() (caller handles waiting)"""
+        ready_time, host = heapq.heappop(self.heap)
+        return self.queues[host].popleft(), host, ready_time
+
+    def release(self, host: str, ready_time: float):
+        """Put a popped host back on the heap at ready_time if it still has URLs"""
+        if self.queues[host]:
+            heapq.heappush(self.heap, (ready_time, host))
+        else:
+            self.scheduled.discard(host)
+
+    def mark_fetched(self, host: str):
+        """Record a request start and release the host behind the delay"""
+        now = time.monotonic()
+        self.last_fetch_time[host] = now
+        self.release(host, now + self.delay)
+
+# Keep-alive connections, reused across fetches to the same host so the
+# TCP/TLS handshake is paid once per host instead of once per URL
+MAX_IDLE_PER_HOST = 10
+MAX_REDIRECTS = 5
+_POOL_LOCK = threading.Lock()
+_IDLE_CONNS: Dict[Tuple[str, str], List[http.client.HTTPConnection]] = collections.defaultdict(list)
+
+def _get_conn(scheme: str, netloc: str, ctx: ssl.SSLContext, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+    with _POOL_LOCK:
+        idle = _IDLE_CONNS.get((scheme, netloc))
+        if idle:
+            return idle.pop(), True
+    if scheme == "https":
+        return http.client.HTTPSConnection(netloc, timeout=timeout, context=ctx), False
+    return http.client.HTTPConnection(netloc, timeout=timeout), False
+
+def _put_conn(scheme: str, netloc: str, conn: http.client.HTTPConnection):
+    with _POOL_LOCK:
+        idle = _IDLE_CONNS[(scheme, netloc)]
+        if len(idle) < MAX_IDLE_PER_HOST:
+            idle.append(conn)
+            return
+    conn.close()
+
+def _get(pu: urllib.parse.SplitResult, ctx: ssl.SSLContext, user_agent: str, timeout: float) -> Tuple[http.client.HTTPResponse, bytes]:
+    path = urllib.parse.urlunsplit(("", "", pu.path or "/", pu.query, ""))
+    while True:
+        conn, reused = _get_conn(pu.scheme, pu.netloc, ctx, timeout)
+        try:
+            conn.request("GET", path, headers={"User-Agent": user_agent, "Connection": "keep-alive"})
+            resp = conn.getresponse()
+            data = resp.read()
+        except ConnectionError:
+            conn.close()
+            # The server may have dropped an idle connection; retry on a fresh one
+            if reused:
+                continue
+            raise
+        except Exception:
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            _put_conn(pu.scheme, pu.netloc, conn)
+        return resp, data
 
 def fetch(url: str, ctx: ssl.SSLContext, user_agent: str = "mini-search-bot/0.1 (+contact: you@example.com)", timeout: float = 12.0) -> Tuple[int, bytes, Dict[str, str], str]:
-    req = urllib.request.Request(url, headers={"User-Agent": user_agent})
-    with contextlib.closing(urllib.request.urlopen(req, timeout=timeout, context=ctx)) as resp:
-        code = resp.getcode() or 0
-        data = resp.read()
-        headers = {k.lower(): v for k, v in resp.headers.items()}
-        final_url = resp.geturl()
-        return code, data, headers, final_url
+    for _ in range(MAX_REDIRECTS + 1):
+        pu = urllib.parse.urlsplit(url)
+        if pu.scheme not in ("http", "https"):
+            raise urllib.error.URLError(f"unsupported scheme: {url}")
+        resp, data = _get(pu, ctx, user_agent, timeout)
+        location = resp.getheader("location")
+        if resp.status in (301, 302, 303, 307, 308) and location:
+            url = urllib.parse.urljoin(url, location)
+            continue
+        if resp.status >= 400:
+            raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.msg, None)
+        headers = {k.lower(): v for k, v in resp.getheaders()}
+        return resp.status, data, headers, url
+    raise urllib.error.URLError(f"too many redirects: {url}")
+
+# robots.txt parsers per scheme://netloc, so every host in a --scope domain
+# crawl is checked against its own rules and each file is parsed once
+ROBOTS_TTL = 6 * 3600
+_ROBOTS: Dict[str, Tuple[Optional[urllib.robotparser.RobotFileParser], float]] = {}
+
+def get_robots(scheme: str, netloc: str, ctx: ssl.SSLContext, user_agent: str, verbose: bool = False) -> Optional[urllib.robotparser.RobotFileParser]:
+    origin = f"{scheme}://{netloc}"
+    cached = _ROBOTS.get(origin)
+    if cached and time.monotonic() - cached[1] < ROBOTS_TTL:
+        return cached[0]
+
+    # robots: fetch using our TLS context; None means default allow
+    rp: Optional[urllib.robotparser.RobotFileParser] = None
+    robots_url = urllib.parse.urljoin(origin, "/robots.txt")
+    try:
+        code, data, headers, final_url = fetch(robots_url, ctx=ctx, user_agent=user_agent)
+        if 200 <= code < 300 and same_domain(final_url, robots_url):
+            rp = urllib.robotparser.RobotFileParser()
+            rp.parse(data.decode("utf-8", errors="ignore").splitlines())
+            if verbose:
+                print(f"[crawl] robots: {robots_url} loaded=True")
+        else:
+            if verbose:
+                print(f"[crawl] robots: load failed code={code} redirected_to={final_url}")
+    except Exception as e:
+        if verbose:
+            print(f"[crawl] robots: error {e} (default allow)")
+    _ROBOTS[origin] = (rp, time.monotonic())
+    return rp
 
 class LinkAndTextExtractor(HTMLParser):
     def __init__(self):
@@ -141,13 +312,39 @@ def parse_html(raw: bytes, encoding_hint: str | None = None) -> Tuple[str, str,
         html_text = raw.decode(enc, errors="ignore")
     except LookupError:
         html_text = raw.decode("utf-8", errors="ignore")
+    if SELECTOLAX_AVAILABLE:
+        return parse_html_fast(html_text)
     p = LinkAndTextExtractor()
     p.feed(html_text)
     return p.title or "", p.text, p.links
 
-TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
+def parse_html_fast(html_text: str) -> Tuple[str, str, List[str]]:
+    tree = FastHTMLParser(html_text)
+    title_node = tree.css_first("title")
+    title = title_node.text(strip=True) if title_node else ""
+    tree.strip_tags(["script", "style", "noscript", "title"])
+    body = tree.body or tree.root
+    text = body.text(separator=" ", strip=True) if body else ""
+    links = [a.attributes.get("href") for a in tree.css("a[href]")]
+    return title, text, [h for h in links if h]
+
+# Lowercase the whole string once; findall then returns final tokens
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Byte lookup table: [a-z0-9] map to themselves, everything else to a space.
+# Non-ASCII chars become '?' on encode and so also split tokens, matching TOKEN_RE.
+_TOKEN_LUT = bytes(c if (48 <= c <= 57 or 97 <= c <= 122) else 32 for c in range(256))
+
 def tokenize(s: str) -> List[str]:
-    return [t.lower() for t in TOKEN_RE.findall(s)]
+    # Same tokens as TOKEN_RE.findall(s.lower()), but the scan runs in bytes.translate
+    return s.lower().encode("ascii", "replace").translate(_TOKEN_LUT).decode("ascii").split()
+
+def prefix_range(sorted_terms: List[str], prefix: str) -> List[str]:
+    # Slice of sorted_terms that start with prefix; all of them for an empty prefix
+    if not prefix:
+        return sorted_terms
+    lo = bisect.bisect_left(sorted_terms, prefix)
+    hi = bisect.bisect_left(sorted_terms, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo)
+    return sorted_terms[lo:hi]
 
 def try_seed_sitemap(start_url: str, ctx, user_agent: str, verbose: bool):
     # Try /sitemap.xml and enqueue <loc> links that match scope
@@ -179,14 +376,14 @@ def try_seed_sitemap(start_url: str, ctx, user_agent: str, verbose: bool):
             print(f"[sitemap] error: {e}")
     return []
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Document:
     url: str
     title: str
     length: int
     snippet: str
 
-def crawl(start_url: str, max_pages: int, out_dir: str, user_agent: str, verbose: bool, insecure: bool, scope: str, seed_smap: bool):
+def crawl(start_url: str, max_pages: int, out_dir: str, user_agent: str, verbose: bool, insecure: bool, scope: str, seed_smap: bool, workers: int = 8):
     os.makedirs(out_dir, exist_ok=True)
     pages_dir = os.path.join(out_dir, "pages")
     os.makedirs(pages_dir, exist_ok=True)
@@ -196,116 +393,145 @@ def crawl(start_url: str, max_pages: int, out_dir: str, user_agent: str, verbose
         print("Invalid start URL")
         return
 
-    start_host = host_only(start_url)
     ctx = make_ssl_context(insecure=insecure, verbose=verbose)
 
-    # robots: fetch using our TLS context
-    rp = urllib.robotparser.RobotFileParser()
-    robots_url = urllib.parse.urljoin(f"{urllib.parse.urlsplit(start_url).scheme}://{start_host}", "/robots.txt")
-    robots_ok = False
-    try:
-        code, data, headers, final_url = fetch(robots_url, ctx=ctx, user_agent=user_agent)
-        if 200 <= code < 300 and same_domain(final_url, start_url):
-            txt = data.decode("utf-8", errors="ignore")
-            rp.parse(txt.splitlines())
-            robots_ok = True
-            if verbose:
-                print(f"[crawl] robots: {robots_url} loaded=True")
-        else:
-            if verbose:
-                print(f"[crawl] robots: load failed code={code} redirected_to={final_url}")
-    except Exception as e:
-        if verbose:
-            print(f"[crawl] robots: error {e} (default allow)")
-
     def allowed(u: str) -> bool:
-        if robots_ok:
+        pu = urllib.parse.urlsplit(u)
+        rp = get_robots(pu.scheme, pu.netloc, ctx=ctx, user_agent=user_agent, verbose=verbose)
+        if rp is not None:
             ok = rp.can_fetch("*", u)
             if verbose and not ok:
                 print(f"[robots] disallow: {u}")
             return ok
         return True
 
-    q = queue.Queue()
-    q.put(start_url)
+    frontier = HostFrontier()
+    frontier.put(start_url)
     if seed_smap:
         sm_urls = try_seed_sitemap(start_url, ctx=ctx, user_agent=user_agent, verbose=verbose)
         for u in sm_urls:
-            q.put(u)
-    seen: Set[str] = set()
-    last_fetch_time: Dict[str, float] = {}
+            frontier.put(u)
+    # Visited URLs are kept as their 64-bit str hashes rather than the strings
+    # themselves: ints are far smaller, and a collision at crawl scale is
+    # vanishingly unlikely (it would only skip one page)
+    seen: Set[int] = set()
 
-    fetched = 0
-    while not q.empty() and fetched < max_pages:
-        url = q.get()
-        if url in seen:
-            continue
-        seen.add(url)
-
-        allowed_host = same_domain if scope == 'host' else same_reg_domain
-        if not allowed_host(url, start_url):
-            if verbose:
-                print(f"[skip] cross-domain: {url}")
-            continue
-        if not allowed(url):
-            continue
-
-        host = host_only(url)
-        sleep_polite(last_fetch_time, host, delay=0.75)
-        try:
-            code, data, headers, final_url = fetch(url, ctx=ctx, user_agent=user_agent, timeout=12.0)
-            last_fetch_time[host] = time.time()
-        except Exception as e:
-            if verbose:
-                print(f"[error] fetch {url}: {e}")
-            continue
-
-        if not allowed_host(final_url, start_url):
-            if verbose:
-                print(f"[skip] redirected to other domain: {final_url}")
-            continue
-
-        ctype = headers.get("content-type", "")
-        if "text/html" not in ctype:
-            if verbose:
-                print(f"[skip] non-HTML content-type for {url}: {ctype}")
-            continue
-
-        title, text, links = parse_html(data, headers.get("content-type"))
-        if not text.strip():
-            if verbose:
-                print(f"[skip] empty text: {url}")
-            continue
-
-        doc = {
-            "url": norm_url(final_url),
-            "title": title,
-            "text": text,
-            "outlinks": [norm_url(h, base=final_url) for h in links if h],
-        }
-        with open(os.path.join(pages_dir, f"{fetched}.json"), "w", encoding="utf-8") as f:
-            json.dump(doc, f, ensure_ascii=False)
-
-        fetched += 1
-        if verbose:
-            print(f"[ok] {fetched}: {doc['url']} (title='{title[:60]}')")
-        random.shuffle(doc["outlinks"])
-        enq = 0
-        for h in doc["outlinks"]:
-            if h and allowed_host(h, start_url) and (h not in seen) and allowed(h):
-                q.put(h)
-                enq += 1
-        if verbose:
-            print(f"[queue] enqueued {enq} outlinks from this page")
-
-        if fetched % 50 == 0 and verbose:
-            print(f"[crawl] fetched {fetched}/{max_pages}")
+    # Scope checks compare already-extracted hosts, so no URL is re-split for them
+    start_host = host_only(start_url)
+    if scope == 'host':
+        host_ok = lambda h: h == start_host
+    else:
+        start_root = reg_domain(start_host)
+        host_ok = lambda h: reg_domain(h) == start_root
 
-    with open(os.path.join(out_dir, "crawl_meta.json"), "w", encoding="utf-8") as f:
-        json.dump({"start_url": start_url, "fetched": fetched}, f)
+    # Fetches run on a thread pool so network waits overlap; parsing, the
+    # frontier and file writes stay on this thread
+    fetched = 0
+    inflight: Dict[concurrent.futures.Future, str] = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        while (inflight or frontier) and fetched < max_pages:
+            while frontier and len(inflight) < workers and fetched + len(inflight) < max_pages:
+                # Politeness: only sleep when no host is ready and nothing is in flight
+                wait = frontier.next_ready_time() - time.monotonic()
+                if wait > 0:
+                    if inflight:
+                        break
+                    time.sleep(wait)
+
+                url, host, ready_time = frontier.pop()
+                url_hash = hash(url)
+                if url_hash in seen:
+                    frontier.release(host, ready_time)
+                    continue
+                seen.add(url_hash)
+
+                if not host_ok(host):
+                    if verbose:
+                        print(f"[skip] cross-domain: {url}")
+                    frontier.release(host, ready_time)
+                    continue
+                if not allowed(url):
+                    frontier.release(host, ready_time)
+                    continue
+
+                frontier.mark_fetched(host)
+                inflight[pool.submit(fetch, url, ctx=ctx, user_agent=user_agent, timeout=12.0)] = url
+
+            if not inflight:
+                continue
+            # Wake up for the next completion, or when the next host becomes ready
+            timeout = None
+            if frontier and len(inflight) < workers and fetched + len(inflight) < max_pages:
+                timeout = max(0.0, frontier.next_ready_time() - time.monotonic())
+            done, _ = concurrent.futures.wait(inflight, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+            for fut in done:
+                url = inflight.pop(fut)
+                if fetched >= max_pages:
+                    continue
+                try:
+                    code, data, headers, final_url = fut.result()
+                except Exception as e:
+                    if verbose:
+                        print(f"[error] fetch {url}: {e}")
+                    continue
+
+                if not host_ok(host_only(final_url)):
+                    if verbose:
+                        print(f"[skip] redirected to other domain: {final_url}")
+                    continue
+
+                ctype = headers.get("content-type", "")
+                if "text/html" not in ctype:
+                    if verbose:
+                        print(f"[skip] non-HTML content-type for {url}: {ctype}")
+                    continue
+
+                title, text, links = parse_html(data, headers.get("content-type"))
+                if not text.strip():
+                    if verbose:
+                        print(f"[skip] empty text: {url}")
+                    continue
+
+                outlinks = [norm_url(h, base=final_url) for h in links if h]
+                doc = {
+                    "url": norm_url(final_url),
+                    "title": title,
+                    "text": text,
+                    "outlinks": outlinks,
+                }
+                write_json(os.path.join(pages_dir, f"{fetched}.json"), doc)
+
+                fetched += 1
+                if verbose:
+                    print(f"[ok] {fetched}: {doc['url']} (title='{title[:60]}')")
+                # Normalize/split each outlink once and reuse its host for scope and queueing
+                outlink_hosts = [(u, host_only(u)) for u in outlinks if u]
+                random.shuffle(outlink_hosts)
+                enq = 0
+                for u, h in outlink_hosts:
+                    if host_ok(h) and (hash(u) not in seen) and allowed(u):
+                        frontier.put(u, h)
+                        enq += 1
+                if verbose:
+                    print(f"[queue] enqueued {enq} outlinks from this page")
+
+                if fetched % 50 == 0 and verbose:
+                    print(f"[crawl] fetched {fetched}/{max_pages}")
+
+    write_json(os.path.join(out_dir, "crawl_meta.json"), {"start_url": start_url, "fetched": fetched})
     print(f"[crawl] done: {fetched} pages")
-
-def build(out_dir: str):
+    # Don't carry this crawl's URL caches into the next session
+    _norm_url_nobase.cache_clear()
+    host_only.cache_clear()
+
+def parse_page(fp: str) -> Tuple[str, str, int, str, Dict[str, int], List[str]]:
+    """Read and tokenize one saved page (top-level so build() can run it in worker processes)"""
+    d = read_json(fp)
+    title = d.get("title", "")
+    toks = tokenize(title + " " + d.get("text", ""))
+    return d["url"], title, len(toks), " ".join(toks[:30]), collections.Counter(toks), d.get("outlinks", [])
+
+def build(out_dir: str, workers: Optional[int] = None):
     pages_dir = os.path.join(out_dir, "pages")
     if not os.path.isdir(pages_dir):
         print("[build] no pages/ directory found")
@@ -315,59 +541,67 @@ def build(out_dir: str):
         print("[build] no page JSON files found")
         return
 
-    postings: Dict[str, Dict[int, int]] = collections.defaultdict(lambda: collections.defaultdict(int))
+    # Per term: parallel uint32 arrays of doc ids and tfs. Pages are merged in
+    # doc id order, so the doc id arrays come out already sorted
+    postings: Dict[str, Tuple[array.array, array.array]] = {}
     doclen: Dict[int, int] = {}
     docs: Dict[int, Document] = {}
     graph: Dict[int, List[int]] = collections.defaultdict(list)
     url_to_id: Dict[str, int] = {}
 
-    for i, fp in enumerate(files):
-        with open(fp, "r", encoding="utf-8") as f:
-            d = json.load(f)
-        url_to_id[d["url"]] = i
-
-    for i, fp in enumerate(files):
-        with open(fp, "r", encoding="utf-8") as f:
-            d = json.load(f)
-        title = d.get("title", "")
-        text = d.get("text", "")
-        toks = tokenize(title + " " + text)
-        doclen[i] = len(toks)
-        snippet = " ".join(toks[:30])
-        docs[i] = Document(url=d["url"], title=title.strip() or d["url"], length=len(toks), snippet=snippet)
-
-        cnt = collections.Counter(toks)
-        for t, tf in cnt.items():
-            postings[t][i] = tf
-
-        outs = []
-        for u in d.get("outlinks", []):
-            uid = url_to_id.get(u)
-            if uid is not None:
-                outs.append(uid)
-        graph[i] = outs
+    # Pages are parsed and tokenized in worker processes; the merge into
+    # postings stays here, in file order, so doc ids are stable. Outlinks are
+    # resolved once every page has an id
+    workers = workers or os.cpu_count() or 1
+    pending_outlinks: List[Tuple[int, List[str]]] = []
+    with contextlib.ExitStack() as stack:
+        if workers > 1 and len(files) > 1:
+            ex = stack.enter_context(concurrent.futures.ProcessPoolExecutor(max_workers=workers))
+            parsed = ex.map(parse_page, files, chunksize=32)
+        else:
+            parsed = map(parse_page, files)
+        for i, (url, title, length, snippet, cnt, outlinks) in enumerate(parsed):
+            url_to_id[url] = i
+            doclen[i] = length
+            docs[i] = Document(url=url, title=title.strip() or url, length=length, snippet=snippet)
+            for t, tf in cnt.items():
+                p = postings.get(t)
+                if p is None:
+                    p = postings[t] = (array.array("I"), array.array("I"))
+                p[0].append(i)
+                p[1].append(tf)
+            pending_outlinks.append((i, outlinks))
+
+    for i, outlinks in pending_outlinks:
+        graph[i] = [url_to_id[u] for u in outlinks if u in url_to_id]
 
     N = max(doclen.keys(), default=-1) + 1
-    df = {t: len(ds) for t, ds in postings.items()}
+    df = {t: len(doc_ids) for t, (doc_ids, _) in postings.items()}
     idf = {t: math.log(1 + (N - df_t + 0.5) / (df_t + 0.5)) for t, df_t in df.items()}
     avgdl = (sum(doclen.values()) / N) if N else 0.0
 
     pr = pagerank(graph, N, gamma=0.85, tol=1e-6, max_iter=100)
 
-    with open(os.path.join(out_dir, "index.json"), "w", encoding="utf-8") as f:
-        json.dump({
-            "idf": idf,
-            "avgdl": avgdl,
-            "doclen": doclen,
-            "docs": {k: dataclasses.asdict(v) for k, v in docs.items()},
-        }, f)
-
-    with open(os.path.join(out_dir, "postings.jsonl"), "w", encoding="utf-8") as f:
-        for t, ds in postings.items():
-            f.write(json.dumps({"t": t, "ds": ds}, ensure_ascii=False) + "\n")
-
-    with open(os.path.join(out_dir, "pagerank.json"), "w", encoding="utf-8") as f:
-        json.dump(pr, f)
+    write_json(os.path.join(out_dir, "index.json"), {
+        "idf": idf,
+        "avgdl": avgdl,
+        "doclen": doclen,
+        "docs": {k: dataclasses.asdict(v) for k, v in docs.items()},
+    })
+
+    # Binary postings: per term, uint32 doc ids (sorted) followed by uint32
+    # tfs, located through postings.idx ({term: [byte offset, count]})
+    offsets: Dict[str, Tuple[int, int]] = {}
+    with open(os.path.join(out_dir, "postings.bin"), "wb") as f:
+        for t, (doc_ids, tfs) in postings.items():
+            offsets[t] = (f.tell(), len(doc_ids))
+            if sys.byteorder == "big":
+                doc_ids.byteswap()
+                tfs.byteswap()
+            doc_ids.tofile(f)
+            tfs.tofile(f)
+    write_json(os.path.join(out_dir, "postings.idx"), offsets)
+    write_json(os.path.join(out_dir, "pagerank.json"), pr)
 
     print(f"[build] N={N}, vocab={len(postings)} avgdl={avgdl:.2f}")
 
@@ -375,66 +609,99 @@ def pagerank(outlinks: Dict[int, List[int]], n: int, gamma: float = 0.85, tol: f
     N = n
     if N == 0:
         return {}
-    pr = {i: 1.0 / N for i in range(N)}
-    outdeg = {i: len(outlinks.get(i, [])) for i in range(N)}
+    # Sparse edge list built once: (source, targets, 1/outdeg) per linking doc,
+    # plus the dangling docs whose rank is spread evenly
+    edges = [(j, outs, 1.0 / len(outs)) for j, outs in outlinks.items() if outs]
+    dangling = [i for i in range(N) if not outlinks.get(i)]
+    base = (1.0 - gamma) / N
+    pr = [1.0 / N] * N
     for _ in range(max_iter):
-        sink_sum = sum(pr[i] for i in range(N) if outdeg.get(i, 0) == 0)
-        base = (1.0 - gamma) / N
-        sink_add = gamma * sink_sum / N
-        new = {i: base + sink_add for i in range(N)}
-        for j, outs in outlinks.items():
-            if not outs:
-                continue
-            w = gamma * pr[j] / len(outs)
+        sink_sum = sum(map(pr.__getitem__, dangling))
+        new = [base + gamma * sink_sum / N] * N
+        for j, outs, inv_deg in edges:
+            w = gamma * pr[j] * inv_deg
             for i in outs:
                 new[i] += w
-        delta = sum(abs(new[i] - pr[i]) for i in range(N))
+        delta = sum(map(abs, map(operator.sub, new, pr)))
         pr = new
         if delta < tol:
             break
-    return pr
+    return dict(enumerate(pr))
+
+def bm25_lennorm(doclen: List[int], avgdl: float, k1: float = 1.2, b: float = 0.75) -> List[float]:
+    """Per-document length normalization k1*(1 - b + b*dl/avgdl), indexed by doc id"""
+    b_avgdl = b / (avgdl or 1.0)
+    return [k1 * (1.0 - b + b_avgdl * dl) for dl in doclen]
 
-def bm25_scores(query_terms: List[str], idf: Dict[str, float], postings_iter: Iterable[Tuple[str, Dict[int, int]]], doclen: Dict[int, int], avgdl: float, k1: float = 1.2, b: float = 0.75) -> Dict[int, float]:
+def bm25_scores(query_terms: List[str], idf: Dict[str, float], postings_iter: Iterable[Tuple[str, array.array, array.array]], doclen: List[int], avgdl: float, k1: float = 1.2, b: float = 0.75, lennorm: Optional[List[float]] = None) -> Dict[int, float]:
     scores: Dict[int, float] = collections.defaultdict(float)
-    terms = [t for t in query_terms if t in idf]
+    terms = {t for t in query_terms if t in idf}
     if not terms:
         return {}
-    for term, plist in postings_iter:
+    if lennorm is None:
+        lennorm = bm25_lennorm(doclen, avgdl, k1, b)
+    k1_1 = k1 + 1.0
+    for term, doc_ids, tfs in postings_iter:
         if term not in terms:
             continue
         idf_t = idf[term]
-        for d, tf in plist.items():
-            denom = tf + k1 * (1.0 + b * ((doclen[d] / (avgdl or 1.0)) - 1.0))
-            scores[d] += idf_t * (tf * (k1 + 1.0)) / (denom or 1e-9)
+        for d, tf in zip(doc_ids, tfs):
+            denom = tf + lennorm[d]
+            scores[d] += idf_t * (tf * k1_1) / (denom or 1e-9)
     return scores
 
-def load_postings(out_dir: str) -> Iterable[Tuple[str, Dict[int, int]]]:
-    with open(os.path.join(out_dir, "postings.jsonl"), "r", encoding="utf-8") as f:
-        for line in f:
-            row = json.loads(line)
-            yield row["t"], {int(k): int(v) for k, v in row["ds"].items()}
+def load_postings_offsets(out_dir: str) -> Dict[str, List[int]]:
+    return read_json(os.path.join(out_dir, "postings.idx"))
+
+def load_postings(out_dir: str, terms: Iterable[str], offsets: Optional[Dict[str, List[int]]] = None) -> Iterable[Tuple[str, array.array, array.array]]:
+    # Only the query terms' byte ranges are read from the memory-mapped file
+    if offsets is None:
+        offsets = load_postings_offsets(out_dir)
+    wanted = [(t, offsets[t]) for t in dict.fromkeys(terms) if t in offsets]
+    if not wanted:
+        return
+    with open(os.path.join(out_dir, "postings.bin"), "rb") as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for t, (off, n) in wanted:
+            doc_ids = array.array("I")
+            tfs = array.array("I")
+            size = n * doc_ids.itemsize
+            doc_ids.frombytes(mm[off:off + size])
+            tfs.frombytes(mm[off + size:off + 2 * size])
+            if sys.byteorder == "big":
+                doc_ids.byteswap()
+                tfs.byteswap()
+            yield t, doc_ids, tfs
 
 def load_index(out_dir: str):
-    with open(os.path.join(out_dir, "index.json"), "r", encoding="utf-8") as f:
-        idx = json.load(f)
-    with open(os.path.join(out_dir, "pagerank.json"), "r", encoding="utf-8") as f:
-        pr = json.load(f)
-    idx["doclen"] = {int(k): int(v) for k, v in idx["doclen"].items()}
+    idx = read_json(os.path.join(out_dir, "index.json"))
+    pr = read_json(os.path.join(out_dir, "pagerank.json"))
+    # Dense list indexed by doc id (ids are 0..N-1)
+    doclen = [0] * len(idx["doclen"])
+    for k, v in idx["doclen"].items():
+        doclen[int(k)] = int(v)
+    idx["doclen"] = doclen
+    idx["lennorm"] = bm25_lennorm(doclen, idx["avgdl"])
     idx["docs"] = {int(k): Document(**v) for k, v in idx["docs"].items()}
     pr = {int(k): float(v) for k, v in pr.items()}
+    # PageRank range for normalization, computed once per load instead of per query
+    if pr:
+        idx["pr_min"], idx["pr_max"] = min(pr.values()), max(pr.values())
+    else:
+        idx["pr_min"], idx["pr_max"] = 0.0, 1.0
     return idx, pr
 
 def hybrid_rank(query: str, out_dir: str, alpha: float, beta: float, k: int = 10, title_boost: float = 0.5):
     idx, pr = load_index(out_dir)
+    return hybrid_rank_preloaded(query, idx, pr, out_dir, alpha, beta, k=k, title_boost=title_boost)
+
+def hybrid_rank_preloaded(query: str, idx: dict, pr: Dict[int, float], out_dir: str, alpha: float, beta: float, k: int = 10, title_boost: float = 0.5, offsets: Optional[Dict[str, List[int]]] = None):
+    """hybrid_rank over an index already returned by load_index (and optionally the postings offsets)"""
     qterms = tokenize(query)
-    bm = bm25_scores(qterms, idx["idf"], load_postings(out_dir), idx["doclen"], idx["avgdl"])
+    bm = bm25_scores(qterms, idx["idf"], load_postings(out_dir, qterms, offsets), idx["doclen"], idx["avgdl"], lennorm=idx["lennorm"])
     if not bm:
         return []
-    if pr:
-        vals = list(pr.values())
-        mn, mx = min(vals), max(vals)
-    else:
-        mn, mx = 0.0, 1.0
+    mn, mx = idx["pr_min"], idx["pr_max"]
     def pr_norm(d):
         if mx - mn < 1e-12:
             return 0.0
@@ -471,15 +738,45 @@ def hybrid_rank(query: str, out_dir: str, alpha: float, beta: float, k: int = 10
     top = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:k]
     return [(idx["docs"][d], s) for d, s in top]
 
+# (version, idx, pr, offsets) per data dir, held by each rank_in_worker process
+_WORKER_INDEX: Dict[str, tuple] = {}
+
+def _worker_index(out_dir: str, version):
+    """(idx, pr, offsets) for out_dir, reloaded when version changes"""
+    cached = _WORKER_INDEX.get(out_dir)
+    if cached is None or cached[0] != version:
+        idx, pr = load_index(out_dir)
+        cached = _WORKER_INDEX[out_dir] = (version, idx, pr, load_postings_offsets(out_dir))
+    return cached[1:]
+
+def preload_worker_index(out_dir: str, version) -> None:
+    """Process pool initializer: load the index before the first query reaches the worker"""
+    if version is not None:
+        _worker_index(out_dir, version)
+
+def rank_in_worker(out_dir: str, version, query: str, alpha: float, beta: float, k: int = 10):
+    """hybrid_rank_preloaded for a process pool worker; the index is loaded once per version
+
+    Returns plain (url, title, snippet, score, length) tuples so results pickle cheaply.
+    """
+    idx, pr, offsets = _worker_index(out_dir, version)
+    return [
+        (doc.url, doc.title, doc.snippet, float(score), doc.length)
+        for doc, score in hybrid_rank_preloaded(query, idx, pr, out_dir, alpha, beta, k=k, offsets=offsets)
+    ]
+
 def cmd_crawl(args):
-    crawl(args.start, args.max_pages, args.out, user_agent=args.user_agent, verbose=args.verbose, insecure=args.insecure, scope=args.scope, seed_smap=args.seed_sitemap)
+    crawl(args.start, args.max_pages, args.out, user_agent=args.user_agent, verbose=args.verbose, insecure=args.insecure, scope=args.scope, seed_smap=args.seed_sitemap, workers=args.workers)
 
 def cmd_build(args):
-    build(args.data)
+    build(args.data, workers=args.workers)
 
 def cmd_search(args):
     alpha, beta = args.alpha, args.beta
     print(f"[search] data={args.data}  alpha={alpha}  beta={beta}")
+    # Load the index once; each query is then just postings reads and scoring
+    idx, pr = load_index(args.data)
+    offsets = load_postings_offsets(args.data)
     print("Type a query (or 'exit')")
     while True:
         try:
@@ -489,7 +786,7 @@ def cmd_search(args):
             break
         if not q or q.lower() in {"exit", "quit"}:
             break
-        results = hybrid_rank(q, args.data, alpha, beta, k=args.k)
+        results = hybrid_rank_preloaded(q, idx, pr, args.data, alpha, beta, k=args.k, offsets=offsets)
         if not results:
             print("No results.")
             continue
@@ -513,10 +810,12 @@ def main():
     ap_crawl.add_argument("--insecure", action="store_true", help="DISABLE TLS verification (dev only)")
     ap_crawl.add_argument("--scope", choices=["host","domain"], default="host", help="crawl scope: host (exact host) or domain (include subdomains)")
     ap_crawl.add_argument("--seed-sitemap", dest="seed_sitemap", action="store_true", help="seed frontier from /sitemap.xml if available")
+    ap_crawl.add_argument("--workers", type=int, default=8, help="concurrent fetches")
     ap_crawl.set_defaults(func=cmd_crawl)
 
     ap_build = sub.add_parser("build", help="build inverted index + pagerank from saved pages")
     ap_build.add_argument("--data", required=True, help="output directory used in crawl")
+    ap_build.add_argument("--workers", type=int, default=None, help="parse processes (default: CPU count)")
     ap_build.set_defaults(func=cmd_build)
 
     ap_search = sub.add_parser("search", help="interactive BM25×PageRank search")
@@ -4,19 +4,76 @@ MongoDB-based search engine
 Provides BM25 + PageRank hybrid ranking using MongoDB as the data source
 """
 
+import array
+import hashlib
+import heapq
 import math
+import operator
+import os
+import pickle
 import re
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from collections import Counter
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import OperationFailure
+
+from mini_search import prefix_range
 
 TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
 
+# Documents per cursor batch when reading the corpus (fewer getMore round-trips)
+INDEX_BATCH_SIZE = 1000
+
+# Built indexes are pickled here so a restarted process can skip the rebuild.
+# The directory must be private to this user (see _private_dir): unpickling
+# a file someone else wrote would run their code
+INDEX_CACHE_DIR = os.environ.get('INDEX_CACHE_DIR', os.path.join(tempfile.gettempdir(), f'search-engine-index-{os.getuid() if hasattr(os, "getuid") else 0}'))
+# Bump when the layout of the index cache changes so stale pickles are ignored
+INDEX_FORMAT_VERSION = 3
+
+# Entries kept in each per-engine LRU (query results, suggestions)
+QUERY_CACHE_SIZE = 512
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
 def tokenize(s: str) -> List[str]:
     """Tokenize text into lowercase alphanumeric tokens"""
+    if s.isascii():
+        # Lowercase once up front rather than per token. Only exact for ASCII:
+        # a few non-ASCII characters (e.g. the Kelvin sign) lowercase to letters
+        return TOKEN_RE.findall(s.lower())
     return [t.lower() for t in TOKEN_RE.findall(s)]
 
+def page_token_counts(title: str, text: str, snippet: str = '') -> Dict[str, int]:
+    """Term counts for a page as indexed (title plus full text, or snippet if there is no text)
+
+    Stored on each page as token_counts by the crawlers, so index builds
+    don't have to fetch and tokenize the raw text.
+    """
+    return dict(Counter(tokenize(f"{title} {text or snippet}")))
+
+def _private_dir(path: str) -> Optional[str]:
+    """Create path as a directory only this user can use; None if that can't be ensured"""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.lstat(path)
+        if not stat.S_ISDIR(st.st_mode) or (hasattr(os, 'getuid') and st.st_uid != os.getuid()):
+            print(f"⚠ Not using index cache dir {path}: not a directory owned by this user")
+            return None
+        if st.st_mode & 0o077:
+            os.chmod(path, 0o700)
+    except OSError as e:
+        print(f"⚠ Index cache dir unavailable: {e}")
+        return None
+    return path
+
 @dataclass
 class Document:
     url: str
@@ -27,140 +84,333 @@ class Document:
 class MongoSearchEngine:
     """Search engine using MongoDB as the data source"""
 
-    def __init__(self, mongo_uri: str = 'mongodb://localhost:27017/', db_name: str = 'crawler_db'):
-        """Initialize MongoDB connection and build index cache"""
-        # Simplified connection - let PyMongo handle TLS automatically for mongodb+srv://
-        self.client = MongoClient(
-            mongo_uri,
-            serverSelectionTimeoutMS=30000,
-            connectTimeoutMS=20000,
-            socketTimeoutMS=20000
-        )
+    def __init__(self, mongo_uri: Optional[str] = None, db_name: str = 'crawler_db', text_search: bool = False, client: Optional[MongoClient] = None, **client_options):
+        """Initialize MongoDB connection and build index cache
+
+        With text_search, search_rows() ranks inside MongoDB using the text
+        index and the per-page pagerank/rank_length fields written by
+        migrate_token_counts.py, without building the in-memory index; it
+        only falls back to the in-memory BM25 index if that query fails.
+        An existing client can be passed in to share its connection pool;
+        close() then leaves it open. mongo_uri is still required with it,
+        since it keys the persisted index.
+        """
+        self._owns_client = client is None
+        if mongo_uri is None:
+            if client is not None:
+                raise ValueError('mongo_uri is required with client= (it keys the persisted index)')
+            mongo_uri = 'mongodb://localhost:27017/'
+        if client is None:
+            # Simplified connection - let PyMongo handle TLS automatically for mongodb+srv://
+            options = {
+                'serverSelectionTimeoutMS': 30000,
+                'connectTimeoutMS': 20000,
+                'socketTimeoutMS': 20000
+            }
+            options.update(client_options)
+            client = MongoClient(mongo_uri, **options)
+        self.client = client
         self.db = self.client[db_name]
         self.collection = self.db.crawled_pages
+        # Keyed by deployment and database; the URI is hashed since it may hold credentials
+        self.index_source = hashlib.blake2b(f'{mongo_uri}\0{db_name}'.encode(), digest_size=8).hexdigest()
+        self.index_path = os.path.join(INDEX_CACHE_DIR, f'{db_name}-{self.index_source}.pkl')
+        self.text_search = text_search
 
         # Cache for search index
         self.index_cache = None
         self.last_doc_count = 0
 
+        # LRU caches of ranked results and suggestions; cleared on index rebuild
+        self._query_cache = OrderedDict()
+        self._suggest_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def ensure_indexes(self):
+        """Create the unique url index and the weighted text index used for title/snippet/text queries
+
+        Each is attempted separately, so duplicate urls left by older crawls
+        don't also keep the text index from being built.
+        """
+        try:
+            self.collection.create_index('url', unique=True)
+        except OperationFailure as e:
+            if e.code == 11000:
+                print("⚠ Unique url index not created: the collection has duplicate urls")
+            else:
+                print(f"⚠ Could not create url index: {e}")
+        try:
+            self.collection.create_index(
+                [('title', 'text'), ('text', 'text'), ('snippet', 'text')],
+                weights={'title': 10, 'snippet': 5, 'text': 1},
+                name='pages_text_idx'
+            )
+        except OperationFailure as e:
+            print(f"⚠ Could not create text index: {e}")
+
     def _build_index(self, force_rebuild: bool = False):
         """Build or rebuild the search index from MongoDB"""
-        current_count = self.collection.count_documents({})
+        # Collection metadata count: O(1), unlike count_documents({}) which
+        # scans the collection on every query
+        current_count = self.collection.estimated_document_count()
 
         # Use cache if available and doc count hasn't changed
         if not force_rebuild and self.index_cache and self.last_doc_count == current_count:
             return self.index_cache
 
+        # Fresh process: reuse the index persisted by an earlier one if the
+        # collection hasn't changed since. The marker is taken before reading
+        # the pages, so writes made during the build invalidate the cache file
+        marker = self._content_marker(current_count)
+        if not force_rebuild and self.index_cache is None and self._load_persisted_index(marker):
+            return self.index_cache
+
         print(f"Building search index from {current_count} documents...")
 
-        # Fetch all documents
+        # Fetch all documents. Pages carry precomputed token_counts, so the raw
+        # text (by far the largest field) is left on the server
         docs = list(self.collection.find({}, {
             'url': 1,
             'title': 1,
-            'text': 1,
             'snippet': 1,
             'links': 1,
+            'token_counts': 1,
             '_id': 0
-        }))
+        }).batch_size(INDEX_BATCH_SIZE))
 
         if not docs:
             return None
 
+        # Pages stored before token_counts existed: fetch their text and
+        # tokenize here (migrate_token_counts.py backfills them)
+        texts = self._fetch_missing_texts(docs)
+
         # Build document list
         doc_list = []
-        doc_tokens = []
+        doc_term_counts = []
+        title_tokens = []
         doc_lengths = {}
         url_to_idx = {}
 
         for i, doc in enumerate(docs):
             url = doc.get('url', '')
             title = doc.get('title', 'Untitled')
-            text = doc.get('text', '')
             snippet = doc.get('snippet', '')[:200]
 
-            # Use full text if available, otherwise fall back to snippet
-            content = text if text else snippet
-
-            # Tokenize title and full text content (or snippet as fallback)
-            tokens = tokenize(f"{title} {content}")
+            term_counts = doc.get('token_counts')
+            if term_counts is None:
+                text = texts.get(url, '')
+                # Tokenize title and full text content (or snippet as fallback)
+                term_counts = page_token_counts(title, text, snippet)
 
-            # Generate snippet from text if not provided
-            if not snippet and text:
-                snippet = text[:200]
+                # Generate snippet from text if not provided
+                if not snippet and text:
+                    snippet = text[:200]
+            length = sum(term_counts.values())
 
             doc_list.append(Document(
                 url=url,
                 title=title,
-                length=len(tokens),
+                length=length,
                 snippet=snippet
             ))
-            doc_tokens.append(tokens)
-            doc_lengths[i] = len(tokens)
+            doc_term_counts.append(term_counts)
+            # Title token sets for the title-match bonus, built once here
+            title_tokens.append(frozenset(tokenize(title or '')))
+            doc_lengths[i] = length
             url_to_idx[url] = i
 
         # Calculate average document length
         avgdl = sum(doc_lengths.values()) / len(doc_lengths) if doc_lengths else 0
 
-        # Build inverted index and calculate IDF
+        # BM25 length normalization per document, so a query only adds tf to it
+        k1_b_avgdl = BM25_K1 * BM25_B / (avgdl or 1.0)
+        len_norm = [BM25_K1 * (1 - BM25_B) + k1_b_avgdl * doc_lengths[i] for i in range(len(doc_list))]
+
+        # Build inverted index and calculate IDF. Postings are stored as two
+        # parallel int arrays per term (doc ids, tfs) instead of tuples
         inverted_index = {}
-        for doc_idx, tokens in enumerate(doc_tokens):
-            token_counts = Counter(tokens)
-            for token, count in token_counts.items():
-                if token not in inverted_index:
-                    inverted_index[token] = []
-                inverted_index[token].append((doc_idx, count))
+        for doc_idx, term_counts in enumerate(doc_term_counts):
+            for token, count in term_counts.items():
+                postings = inverted_index.get(token)
+                if postings is None:
+                    postings = inverted_index[token] = (array.array('i'), array.array('i'))
+                postings[0].append(doc_idx)
+                postings[1].append(count)
 
         # Calculate IDF scores
         N = len(doc_list)
         idf = {}
-        for term, postings in inverted_index.items():
-            df = len(postings)
+        for term, (doc_ids, _) in inverted_index.items():
+            df = len(doc_ids)
             idf[term] = math.log((N - df + 0.5) / (df + 0.5) + 1.0)
 
         # Build simple PageRank (based on link structure)
         pagerank = self._calculate_pagerank(docs, url_to_idx)
 
+        # Min-max normalized PageRank per doc, so ranking is a list lookup
+        pr_min = min(pagerank.values(), default=0.0)
+        pr_range = max(pagerank.values(), default=1.0) - pr_min
+        if pr_range < 1e-12:
+            pr_norm = [0.0] * N
+        else:
+            pr_norm = [(pagerank.get(i, 0.0) - pr_min) / pr_range for i in range(N)]
+
         self.index_cache = {
             'docs': doc_list,
+            'rows': [asdict(doc) for doc in doc_list],
+            'title_tokens': title_tokens,
             'doclen': doc_lengths,
             'avgdl': avgdl,
+            'len_norm': len_norm,
             'idf': idf,
+            'sorted_terms': sorted(idf),
             'inverted_index': inverted_index,
-            'pagerank': pagerank
+            'pagerank': pagerank,
+            'pr_norm': pr_norm
         }
         self.last_doc_count = current_count
+        self.clear_caches()
 
         print(f"✓ Index built: {N} docs, {len(idf)} unique terms, avgdl={avgdl:.1f}")
+        self._persist_index(marker)
         return self.index_cache
 
-    def _calculate_pagerank(self, docs: List[dict], url_to_idx: Dict[str, int], iterations: int = 20, damping: float = 0.85) -> Dict[int, float]:
-        """Calculate PageRank scores"""
+    def _fetch_missing_texts(self, docs: List[Dict]) -> Dict[str, str]:
+        """Map url -> text for fetched pages that have no stored token_counts"""
+        missing = [doc.get('url', '') for doc in docs if doc.get('token_counts') is None]
+        texts = {}
+        for start in range(0, len(missing), INDEX_BATCH_SIZE):
+            cursor = self.collection.find(
+                {'url': {'$in': missing[start:start + INDEX_BATCH_SIZE]}},
+                {'url': 1, 'text': 1, '_id': 0}
+            )
+            for doc in cursor:
+                texts[doc.get('url', '')] = doc.get('text', '')
+        return texts
+
+    def store_rank_fields(self, force: bool = False) -> int:
+        """Write normalized pagerank and token length onto each page for the text-index search path
+
+        Meant for a single writer (migrate_token_counts.py), not each serving
+        process. Skipped when the collection's content marker matches the one
+        recorded by the last write, unless force is set. The length goes in
+        rank_length, leaving the crawlers' own length field alone.
+        """
+        marker = self._content_marker(self.collection.estimated_document_count())
+        meta = self.db.index_meta
+        if not force and marker is not None:
+            last = meta.find_one({'_id': 'rank_fields'}) or {}
+            if last.get('marker') == list(marker):
+                return 0
+
+        idx = self._build_index()
+        if not idx:
+            return 0
+        ops = [
+            UpdateOne({'url': doc.url}, {'$set': {'pagerank': pr, 'rank_length': doc.length}})
+            for doc, pr in zip(idx['docs'], idx['pr_norm'])
+        ]
+        try:
+            for start in range(0, len(ops), INDEX_BATCH_SIZE):
+                self.collection.bulk_write(ops[start:start + INDEX_BATCH_SIZE], ordered=False)
+        except Exception as e:
+            print(f"⚠ Could not store rank fields: {e}")
+            return 0
+        if marker is not None:
+            meta.update_one({'_id': 'rank_fields'}, {'$set': {'marker': list(marker)}}, upsert=True)
+        return len(ops)
+
+    def _content_marker(self, doc_count: int) -> Optional[tuple]:
+        """(count, newest _id, newest crawled_at) of the collection, or None if unavailable
+
+        Re-imports replace _ids and re-crawls bump crawled_at, so a changed
+        corpus of the same size still gets a different marker.
+        """
+        try:
+            rows = list(self.collection.aggregate([
+                {'$group': {'_id': None, 'last_id': {'$max': '$_id'}, 'crawled_at': {'$max': '$crawled_at'}}}
+            ]))
+        except Exception as e:
+            print(f"⚠ Could not read collection marker: {e}")
+            return None
+        if not rows:
+            return (doc_count, None, None)
+        return (doc_count, str(rows[0].get('last_id')), rows[0].get('crawled_at'))
+
+    def _load_persisted_index(self, marker: Optional[tuple]) -> bool:
+        """Load the on-disk index if it was built from this database in the state marker describes"""
+        if marker is None or _private_dir(INDEX_CACHE_DIR) is None:
+            return False
+        try:
+            with open(self.index_path, 'rb') as f:
+                saved = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return False
+        if (saved.get('version') != INDEX_FORMAT_VERSION or saved.get('source') != self.index_source
+                or saved.get('marker') != marker):
+            return False
+        self.index_cache = saved['index']
+        self.last_doc_count = marker[0]
+        print(f"✓ Index loaded from {self.index_path}: {len(self.index_cache['docs'])} docs")
+        return True
+
+    def _persist_index(self, marker: Optional[tuple]):
+        """Write the current index to disk (best effort; read-only filesystems just skip it)"""
+        if marker is None or _private_dir(INDEX_CACHE_DIR) is None:
+            return
+        tmp_path = f'{self.index_path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({
+                    'version': INDEX_FORMAT_VERSION,
+                    'source': self.index_source,
+                    'marker': marker,
+                    'index': self.index_cache
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"⚠ Could not persist search index: {e}")
+
+    def _calculate_pagerank(self, docs: List[dict], url_to_idx: Dict[str, int], iterations: int = 100, damping: float = 0.85, tol: float = 1e-6) -> Dict[int, float]:
+        """Calculate PageRank scores
+
+        Stops early once the L1 change between iterations drops below tol;
+        iterations is only an upper bound.
+        """
         N = len(docs)
         if N == 0:
             return {}
 
-        # Build adjacency list
-        outlinks = {i: [] for i in range(N)}
+        # Build adjacency list: resolve every link in one pass, then drop
+        # unknown targets and self-links together
+        resolve = url_to_idx.get
+        outlinks = {}
         for i, doc in enumerate(docs):
-            links = doc.get('links', [])
-            for link in links:
-                if link in url_to_idx:
-                    target_idx = url_to_idx[link]
-                    if target_idx != i:  # No self-links
-                        outlinks[i].append(target_idx)
+            outlinks[i] = [t for t in map(resolve, doc.get('links', [])) if t is not None and t != i]
 
-        # Initialize PageRank
-        pr = {i: 1.0 / N for i in range(N)}
+        # Sparse edge list built once: (source, targets, 1/outdeg) per linking
+        # doc, plus the dangling docs whose rank is spread evenly. Each
+        # iteration is then O(edges) instead of O(N^2)
+        edges = [(j, outs, 1.0 / len(outs)) for j, outs in outlinks.items() if outs]
+        dangling = [i for i in range(N) if not outlinks[i]]
+        base = (1 - damping) / N
 
         # Power iteration
+        pr = [1.0 / N] * N
         for _ in range(iterations):
-            new_pr = {}
-            for i in range(N):
-                rank_sum = sum(pr[j] / len(outlinks[j]) for j in range(N) if i in outlinks[j] and len(outlinks[j]) > 0)
-                new_pr[i] = (1 - damping) / N + damping * rank_sum
+            sink_sum = sum(map(pr.__getitem__, dangling))
+            new_pr = [base + damping * sink_sum / N] * N
+            for j, outs, inv_deg in edges:
+                w = damping * pr[j] * inv_deg
+                for i in outs:
+                    new_pr[i] += w
+            err = sum(map(abs, map(operator.sub, new_pr, pr)))
             pr = new_pr
+            if err < tol:
+                break
 
-        return pr
+        return dict(enumerate(pr))
 
     def search(self, query: str, alpha: float = 0.2, beta: float = 0.8, k: int = 10, title_boost: float = 0.5) -> List[Tuple[Document, float]]:
         """
@@ -176,70 +426,119 @@ class MongoSearchEngine:
         Returns:
             List of (Document, score) tuples
         """
+        idx, top_results = self._rank(query, alpha, beta, k, title_boost)
+        return [(idx['docs'][doc_idx], score) for doc_idx, score in top_results]
+
+    def search_rows(self, query: str, alpha: float = 0.2, beta: float = 0.8, k: int = 10, title_boost: float = 0.5) -> List[dict]:
+        """
+        Hybrid search returning API-ready result dicts
+
+        Same ranking as search(), but each result is a dict with url, title,
+        snippet, length and score, so handlers can serialize it directly.
+        """
+        if self.text_search:
+            try:
+                return self._text_search_rows(query, alpha, beta, k)
+            except OperationFailure as e:
+                # Typically no text index on the collection yet
+                print(f"⚠ Text search unavailable, using in-memory index: {e}")
+                self.text_search = False
+
+        idx, top_results = self._rank(query, alpha, beta, k, title_boost)
+        rows = idx['rows'] if idx else []
+        return [{**rows[doc_idx], 'score': float(score)} for doc_idx, score in top_results]
+
+    def _text_search_rows(self, query: str, alpha: float, beta: float, k: int) -> List[dict]:
+        """Rank with MongoDB's text index: textScore * (alpha + beta * stored pagerank)"""
+        # Keyed on the O(1) metadata count so cached rows expire as pages are added
+        key = ('$text', self.collection.estimated_document_count(), query, alpha, beta, k)
+        rows = self._cache_get(self._query_cache, key)
+        if rows is None:
+            pipeline = [
+                {'$match': {'$text': {'$search': query}}},
+                {'$project': {
+                    '_id': 0,
+                    'url': 1,
+                    'title': {'$ifNull': ['$title', 'Untitled']},
+                    'snippet': {'$substrCP': [{'$ifNull': ['$snippet', '']}, 0, 200]},
+                    'length': {'$ifNull': ['$rank_length', 0]},
+                    'score': {'$multiply': [
+                        {'$meta': 'textScore'},
+                        {'$add': [alpha, {'$multiply': [beta, {'$ifNull': ['$pagerank', 0]}]}]}
+                    ]}
+                }},
+                {'$sort': {'score': -1}},
+                {'$limit': k}
+            ]
+            rows = list(self.collection.aggregate(pipeline))
+            self._cache_put(self._query_cache, key, rows)
+        return [dict(row) for row in rows]
+
+    def _rank(self, query: str, alpha: float, beta: float, k: int, title_boost: float):
+        """Score the query against the cached index; returns (index, top-k (doc_idx, score) pairs)"""
         # Build/refresh index
         idx = self._build_index()
         if not idx:
-            return []
-
+            return idx, []
+
+        key = (query, alpha, beta, k, title_boost)
+        top_results = self._cache_get(self._query_cache, key)
+        if top_results is None:
+            top_results = self._score(idx, query, alpha, beta, k, title_boost)
+            self._cache_put(self._query_cache, key, top_results)
+        return idx, top_results
+
+    def clear_caches(self):
+        """Drop cached query results and suggestions"""
+        with self._cache_lock:
+            self._query_cache.clear()
+            self._suggest_cache.clear()
+
+    def _cache_get(self, cache: OrderedDict, key):
+        with self._cache_lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _cache_put(self, cache: OrderedDict, key, value):
+        with self._cache_lock:
+            cache[key] = value
+            if len(cache) > QUERY_CACHE_SIZE:
+                cache.popitem(last=False)
+
+    def _score(self, idx: dict, query: str, alpha: float, beta: float, k: int, title_boost: float) -> List[Tuple[int, float]]:
+        """Rank the query against a built index; returns top-k (doc_idx, score) pairs"""
         # Tokenize query
         qterms = tokenize(query)
         if not qterms:
             return []
 
-        # BM25 parameters
-        k1 = 1.5
-        b = 0.75
-
-        # Calculate BM25 scores
+        # Calculate BM25 scores by walking each query term's posting list, so
+        # only documents containing a query term are ever touched
+        inverted_index = idx['inverted_index']
+        len_norm = idx['len_norm']
+        k1_1 = BM25_K1 + 1
         bm25_scores = {}
-        for doc_idx in range(len(idx['docs'])):
-            score = 0.0
-            for term in qterms:
-                if term not in idx['inverted_index']:
-                    continue
-
-                # Find term frequency in this document
-                tf = 0
-                for posting_doc_idx, posting_tf in idx['inverted_index'][term]:
-                    if posting_doc_idx == doc_idx:
-                        tf = posting_tf
-                        break
-
-                if tf == 0:
-                    continue
-
-                # BM25 formula
-                idf_score = idx['idf'].get(term, 0)
-                doc_len = idx['doclen'][doc_idx]
-                avgdl = idx['avgdl']
-
-                numerator = tf * (k1 + 1)
-                denominator = tf + k1 * (1 - b + b * (doc_len / avgdl))
-                score += idf_score * (numerator / denominator)
-
-            if score > 0:
-                bm25_scores[doc_idx] = score
+        get_score = bm25_scores.get
+        for term in qterms:
+            postings = inverted_index.get(term)
+            if not postings:
+                continue
+            # idf * (k1 + 1) is constant across the term's postings
+            weight = idx['idf'].get(term, 0) * k1_1
+            for doc_idx, tf in zip(*postings):
+                bm25_scores[doc_idx] = get_score(doc_idx, 0.0) + weight * tf / (tf + len_norm[doc_idx])
 
         if not bm25_scores:
             return []
 
-        # Normalize PageRank
-        pr_values = list(idx['pagerank'].values())
-        pr_min = min(pr_values) if pr_values else 0.0
-        pr_max = max(pr_values) if pr_values else 1.0
-        pr_range = pr_max - pr_min
-
-        def pr_norm(doc_idx):
-            if pr_range < 1e-12:
-                return 0.0
-            return (idx['pagerank'].get(doc_idx, 0.0) - pr_min) / pr_range
+        pr_norm = idx['pr_norm']
 
         # Calculate title match bonus
         def title_match_score(doc_idx):
-            doc = idx['docs'][doc_idx]
-            title_lower = doc.title.lower()
-            url_lower = doc.url.lower()
-            title_tokens = set(tokenize(title_lower))
+            url_lower = idx['docs'][doc_idx].url.lower()
+            title_tokens = idx['title_tokens'][doc_idx]
 
             matches = 0
             for qt in qterms:
@@ -254,16 +553,32 @@ class MongoSearchEngine:
                 return 0.0
             return title_boost * (matches / len(qterms))
 
-        # Combine scores
-        final_scores = {}
-        for doc_idx, bm_score in bm25_scores.items():
-            pr_score = pr_norm(doc_idx)
-            title_score = title_match_score(doc_idx)
-            final_scores[doc_idx] = bm_score * (alpha + beta * pr_score + title_score)
-
-        # Sort and return top k
-        top_results = sorted(final_scores.items(), key=lambda x: x[1], reverse=True)[:k]
-        return [(idx['docs'][doc_idx], score) for doc_idx, score in top_results]
+        # Walk candidates in BM25 order, keeping the k best combined scores in a
+        # min-heap. The PageRank/title multiplier is at most
+        # alpha + beta + title_boost, so once a candidate's BM25 score times
+        # that bound can't beat the current k-th result, nothing after it can
+        # either and the walk stops; PR/title bonuses are only computed for
+        # the docs visited
+        max_multiplier = alpha + beta + title_boost
+        can_prune = min(alpha, beta, title_boost) >= 0
+        top = []  # (score, -order, doc_idx): ties keep the earlier doc
+        ranked = sorted(bm25_scores.items(), key=lambda x: x[1], reverse=True)
+        for order, (doc_idx, bm_score) in enumerate(ranked):
+            if can_prune and len(top) == k and bm_score * max_multiplier < top[0][0]:
+                break
+            score = bm_score * (alpha + beta * pr_norm[doc_idx] + title_match_score(doc_idx))
+            entry = (score, -order, doc_idx)
+            if len(top) < k:
+                heapq.heappush(top, entry)
+            elif entry > top[0]:
+                heapq.heapreplace(top, entry)
+
+        return [(doc_idx, score) for score, _, doc_idx in sorted(top, reverse=True)]
+
+    def index_version(self) -> int:
+        """Identifies the index being served: the document count it was built from"""
+        self._build_index()
+        return self.last_doc_count
 
     def get_stats(self) -> dict:
         """Get statistics about the search index"""
@@ -287,25 +602,47 @@ class MongoSearchEngine:
         if not idx:
             return []
 
+        key = (prefix, limit)
+        suggestions = self._cache_get(self._suggest_cache, key)
+        if suggestions is None:
+            suggestions = self._suggest(idx, prefix, limit)
+            self._cache_put(self._suggest_cache, key, suggestions)
+        return list(suggestions)
+
+    def _suggest(self, idx: dict, prefix: str, limit: int) -> List[str]:
         prefix_lower = prefix.lower()
         # Remove spaces and special chars for fuzzy matching
         prefix_normalized = ''.join(c for c in prefix_lower if c.isalnum())
 
-        # Find matching terms in vocabulary
-        matching_terms = []
-        for term in idx['idf'].keys():
-            # Exact prefix match
-            if term.startswith(prefix_lower):
-                matching_terms.append((term, 0))  # Priority 0 (highest)
-            # Match without spaces (e.g., "for loops" -> "forloops")
-            elif len(prefix_normalized) >= 3 and term.startswith(prefix_normalized):
-                matching_terms.append((term, 1))  # Priority 1
+        # Prefix matches come straight from the sorted vocabulary via bisect
+        sorted_terms = idx['sorted_terms']
+        # Exact prefix match
+        matching_terms = [(term, 0) for term in prefix_range(sorted_terms, prefix_lower)]  # Priority 0 (highest)
+        # Match without spaces (e.g., "for loops" -> "forloops")
+        if len(prefix_normalized) >= 3 and prefix_normalized != prefix_lower:
+            matching_terms.extend(
+                (term, 1) for term in prefix_range(sorted_terms, prefix_normalized)  # Priority 1
+                if not term.startswith(prefix_lower)
+            )
+
+        # Each lower tier is only scanned when the tiers above it can't fill the
+        # limit * 2 candidate list on their own
+        wanted = limit * 2
+        if len(matching_terms) < wanted and len(prefix_lower) >= 3:
+            matched = {term for term, _ in matching_terms}
             # Contains the prefix
-            elif prefix_lower in term and len(prefix_lower) >= 3:
-                matching_terms.append((term, 2))  # Priority 2
+            substring_terms = [term for term in sorted_terms if prefix_lower in term and term not in matched]
+            matching_terms.extend((term, 2) for term in substring_terms)  # Priority 2
+
             # Fuzzy match - all characters present in order
-            elif len(prefix_normalized) >= 3 and self._fuzzy_match(prefix_normalized, term):
-                matching_terms.append((term, 3))  # Priority 3
+            if len(matching_terms) < wanted and len(prefix_normalized) >= 3:
+                matched.update(substring_terms)
+                # Subsequence test done by the regex engine rather than a char loop
+                fuzzy_search = re.compile('.*?'.join(map(re.escape, prefix_normalized))).search
+                matching_terms.extend(
+                    (term, 3) for term in sorted_terms  # Priority 3
+                    if term not in matched and fuzzy_search(term)
+                )
 
         # Sort by priority, then by IDF score (lower IDF = more common = better)
         matching_terms.sort(key=lambda x: (x[1], idx['idf'].get(x[0], float('inf'))))
@@ -344,7 +681,10 @@ class MongoSearchEngine:
         return all_suggestions[:limit]
 
     def _fuzzy_match(self, pattern: str, text: str) -> bool:
-        """Check if all characters in pattern appear in text in order"""
+        """Check if all characters in pattern appear in text in order
+
+        Kept for callers outside this class; suggestions use a compiled regex.
+        """
         pattern_idx = 0
         for char in text:
             if pattern_idx < len(pattern) and char == pattern[pattern_idx]:
@@ -352,5 +692,6 @@ class MongoSearchEngine:
         return pattern_idx == len(pattern)
 
     def close(self):
-        """Close MongoDB connection"""
-        self.client.close()
+        """Close MongoDB connection (unless the client was passed in)"""
+        if self._owns_client:
+            self.client.close()
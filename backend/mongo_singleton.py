@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Shared pieces for the serverless handlers
+Builds the MongoSearchEngine once per process so warm containers reuse the same client
+"""
+
+import os
+import threading
+
+from mongo_search import MongoSearchEngine
+
+_ENGINE = None
+_LOCK = threading.Lock()
+
+def get_engine():
+    """Return the process-wide MongoSearchEngine, creating it on first use"""
+    global _ENGINE
+    if _ENGINE is not None:
+        return _ENGINE
+
+    with _LOCK:
+        if _ENGINE is None:
+            mongo_uri = os.environ.get('MONGODB_URI', '')
+            if not mongo_uri:
+                return None
+            try:
+                _ENGINE = MongoSearchEngine(
+                    mongo_uri,
+                    text_search=os.environ.get('MONGO_TEXT_SEARCH', 'false').lower() == 'true',
+                    maxPoolSize=10,
+                    minPoolSize=1,
+                    serverSelectionTimeoutMS=2000
+                )
+            except Exception as e:
+                print(f"MongoDB connection failed: {e}")
+                return None
+            try:
+                _ENGINE.ensure_indexes()
+            except Exception as e:
+                print(f"MongoDB index creation failed: {e}")
+    return _ENGINE
+
+def install_cors(app):
+    """Add CORS headers to every response from app"""
+    # Plain CORS headers; skips importing flask-cors on cold start
+    @app.after_request
+    def add_cors_headers(response):
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+        response.headers['Access-Control-Allow-Methods'] = 'GET,OPTIONS'
+        return response
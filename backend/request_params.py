@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Request parameter checks shared by the Flask server and the serverless handlers
+"""
+
+from flask import jsonify
+
+# Upper bounds on client-chosen result counts
+MAX_RESULTS = 500  # the UI fetches 500 and pages client-side
+MAX_STREAM_RESULTS = 1000
+MAX_SUGGESTIONS = 50
+MAX_CRAWL_DEPTH = 5
+
+class ParamError(ValueError):
+    """A request parameter is missing its expected type or range"""
+
+def install_param_errors(app):
+    """Answer ParamError with a 400 JSON error instead of a 500"""
+    @app.errorhandler(ParamError)
+    def param_error(e):
+        return jsonify({'error': str(e)}), 400
+
+def bounded(params, name, default, cast, low, high):
+    """params[name] cast and checked against [low, high], else ParamError"""
+    raw = params.get(name, default)
+    try:
+        value = cast(raw)
+    except (TypeError, ValueError):
+        raise ParamError(f'{name} must be a number') from None
+    if not low <= value <= high:  # also rejects nan
+        raise ParamError(f'{name} must be between {low} and {high}')
+    return value
+
+def search_params(args, max_k=MAX_RESULTS):
+    """(query, alpha, beta, k) from a search request's query string"""
+    query = args.get('q', '').strip()
+    # Rounded so near-identical weights share cache entries
+    alpha = round(bounded(args, 'alpha', 0.2, float, 0.0, 1.0), 3)
+    beta = round(bounded(args, 'beta', 0.8, float, 0.0, 1.0), 3)
+    k = bounded(args, 'k', 10, int, 1, max_k)
+    return query, alpha, beta, k
@@ -4,10 +4,19 @@ HTTP server for mini search engine
 Provides REST API for search queries
 """
 
-from flask import Flask, jsonify, request, send_from_directory
-from flask_cors import CORS
+from flask import Flask, Response, jsonify, request, send_from_directory
+import asyncio
+import atexit
+import hashlib
+import hmac
+import multiprocessing
 import os
+import re
 import sys
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
 
 # Load .env file if it exists (for production)
 try:
@@ -16,25 +25,81 @@ try:
 except ImportError:
     pass
 
+# Faster JSON encoding for search responses (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Response compression (optional)
+try:
+    from flask_compress import Compress
+    COMPRESS_AVAILABLE = True
+except ImportError:
+    COMPRESS_AVAILABLE = False
+
 # Import search functions
-from mini_search import hybrid_rank, load_index
+from mini_search import hybrid_rank_preloaded, load_index, load_postings_offsets, prefix_range, preload_worker_index, rank_in_worker, tokenize
+
+# Crawl jobs run on a Celery worker when celery is installed and REDIS_URL is
+# set; otherwise each /process poll from the frontend crawls the next batch
+from tasks import run_crawl_job
+
+# Parameter limits and validation, shared with the serverless handlers in api/
+from request_params import (
+    MAX_CRAWL_DEPTH, MAX_STREAM_RESULTS, MAX_SUGGESTIONS,
+    ParamError, bounded, install_param_errors, search_params
+)
 
 app = Flask(__name__, static_folder='frontend/build', static_url_path='')
-CORS(app, resources={
-    r"/*": {
-        "origins": "*",
-        "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"],
-        "supports_credentials": True
-    }
-})
-
-# Additional CORS headers for Vercel
+install_param_errors(app)
+
+# Compress JSON and static assets; brotli/zstd are used when their packages
+# are installed and the client accepts them, gzip otherwise
+if COMPRESS_AVAILABLE:
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'zstd', 'gzip']
+    app.config['COMPRESS_MIN_SIZE'] = 500
+    Compress(app)
+
+# CORS: comma-separated allowed origins; entries may use * as a wildcard
+# (e.g. https://*.vercel.app), and a bare * allows any origin
+CORS_ORIGINS = [o.strip() for o in os.environ.get('CORS_ORIGINS', '*').split(',') if o.strip()]
+CORS_ALLOW_ALL = '*' in CORS_ORIGINS
+# Exact origins are a set lookup; wildcard entries share one precompiled pattern
+EXACT_ORIGINS = frozenset(o for o in CORS_ORIGINS if '*' not in o)
+_wildcard_origins = [o for o in CORS_ORIGINS if '*' in o and o != '*']
+WILDCARD_ORIGIN_RE = re.compile(
+    '|'.join(re.escape(o).replace(r'\*', '[^/]+') for o in _wildcard_origins)
+) if _wildcard_origins else None
+CORS_HEADERS = {
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+    'Access-Control-Allow-Methods': 'GET,POST,OPTIONS',
+    'Access-Control-Max-Age': '600'
+}
+
+def cors_origin(origin):
+    """Access-Control-Allow-Origin value for a request origin, or None if not allowed"""
+    if CORS_ALLOW_ALL:
+        return '*'
+    if origin and (origin in EXACT_ORIGINS or (WILDCARD_ORIGIN_RE and WILDCARD_ORIGIN_RE.fullmatch(origin))):
+        return origin
+    return None
+
+@app.before_request
+def cors_preflight():
+    """Answer preflight requests directly; add_cors_headers fills in the headers"""
+    if request.method == 'OPTIONS':
+        return Response(status=204)
+
 @app.after_request
-def after_request(response):
-    response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+def add_cors_headers(response):
+    allowed = cors_origin(request.headers.get('Origin'))
+    if allowed:
+        response.headers['Access-Control-Allow-Origin'] = allowed
+        response.headers.update(CORS_HEADERS)
+        if allowed != '*':
+            response.vary.add('Origin')
     return response
 
 # Configuration
@@ -42,17 +107,92 @@ DATA_DIR = os.environ.get('DATA_DIR', '../data_wiki')
 MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/')
 USE_MONGODB = os.environ.get('USE_MONGODB', 'true').lower() == 'true'
 
+# Ranked result lists kept for repeated file-based searches
+SEARCH_CACHE_SIZE = 1024
+
+# Seconds /api/stats serves its last result before checking the index again
+STATS_TTL = 60
+
+# Bearer token for admin endpoints (/api/cache/clear); unset disables them
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+# Queries made only of these match nearly every page and rank as noise,
+# so they return no results without reaching the ranker
+STOPWORDS = frozenset({'a', 'an', 'and', 'of', 'or', 'the', 'to'})
+
+def json_response(data):
+    """JSON response for the search endpoints, encoded with orjson when available"""
+    if ORJSON_AVAILABLE:
+        return Response(orjson.dumps(data), mimetype='application/json')
+    return jsonify(data)
+
+def index_etag(*parts):
+    """ETag for a response that only changes when the served index does"""
+    if USE_MONGODB and mongo_search_engine:
+        version = ('mongodb', mongo_search_engine.index_version())
+    else:
+        version = ('files', file_index_version())
+    return hashlib.blake2b(repr((version, parts)).encode(), digest_size=8).hexdigest()
+
+def not_modified(etag):
+    """Empty 304 response for a client that already has this ETag"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint for monitoring backend status"""
     return jsonify({'status': 'ok', 'message': 'Backend is running'}), 200
 
+# Files written by `mini_search.py build`; their mtimes identify the index version
+INDEX_FILES = ('index.json', 'postings.idx', 'pagerank.json')
+
+def file_index_version(data_dir=DATA_DIR):
+    """Modification times of the file index, used as a cache key so rebuilds invalidate caches"""
+    return tuple(os.stat(os.path.join(data_dir, name)).st_mtime_ns for name in INDEX_FILES)
+
+# Processes ranking file-based searches off the request threads (0 = rank
+# in-thread). Gunicorn workers already spread requests across cores, so this
+# mainly helps a single `python server.py` process or few large workers
+RANK_PROCESSES = int(os.environ.get('RANK_PROCESSES', '0'))
+RANK_TIMEOUT = 10
+
+# Forked here, before the MongoDB client, crawler loop or any other thread
+# exists. Spawned workers would instead re-run this module's setup, since
+# they re-import the parent's __main__
+rank_pool = None
+if RANK_PROCESSES > 0:
+    from concurrent.futures import ProcessPoolExecutor
+    try:
+        startup_version = file_index_version()
+    except OSError:
+        startup_version = None  # no file index yet; workers load it on first query
+    rank_pool = ProcessPoolExecutor(
+        max_workers=RANK_PROCESSES,
+        mp_context=multiprocessing.get_context('fork'),
+        initializer=preload_worker_index,
+        initargs=(DATA_DIR, startup_version)
+    )
+    # A fork pool starts all of its workers on the first submit
+    rank_pool.submit(int).result()
+    atexit.register(rank_pool.shutdown, cancel_futures=True)
+
 # Initialize MongoDB search engine if enabled
 mongo_search_engine = None
 if USE_MONGODB:
     try:
         from mongo_search import MongoSearchEngine
-        mongo_search_engine = MongoSearchEngine(MONGODB_URI)
+        mongo_search_engine = MongoSearchEngine(
+            MONGODB_URI,
+            text_search=os.environ.get('MONGO_TEXT_SEARCH', 'false').lower() == 'true'
+        )
+        if mongo_search_engine.text_search:
+            # Text-ranked searches need pages_text_idx
+            try:
+                mongo_search_engine.ensure_indexes()
+            except Exception as e:
+                print(f"⚠ MongoDB index creation failed: {e}")
         # Show partial URI for security (hide password)
         uri_display = MONGODB_URI[:30] + "..." if len(MONGODB_URI) > 30 else MONGODB_URI
         print(f"✓ MongoDB search engine initialized")
@@ -75,60 +215,197 @@ except ImportError as e:
     print(f"⚠ WebSocket crawler disabled (missing dependencies: {e})")
     print("  To enable: pip install flask-sock aiohttp beautifulsoup4")
 
+# Crawler job API: one Motor client and job manager, driven by a single
+# background event loop, shared by every request (instead of a new client
+# and event loop per call)
+_crawler_loop = None
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+def get_job_manager():
+    """Return the shared CrawlerJobManager, starting its event loop on first use"""
+    global _crawler_loop, _job_manager
+    if _job_manager is not None:
+        return _job_manager
+
+    with _job_manager_lock:
+        if _job_manager is None:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            from crawler_jobs import CrawlerJobManager
+
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='crawler-jobs-loop', daemon=True).start()
+
+            # Create the client on the loop it will be used from
+            async def _create():
+                return CrawlerJobManager(
+                    AsyncIOMotorClient(MONGODB_URI, maxPoolSize=50, minPoolSize=5)
+                )
+
+            _job_manager = asyncio.run_coroutine_threadsafe(_create(), loop).result()
+            _crawler_loop = loop
+            atexit.register(_close_job_manager)
+    return _job_manager
+
+def run_crawler_job(coro):
+    """Run a job manager coroutine on the shared crawler loop and wait for the result"""
+    return asyncio.run_coroutine_threadsafe(coro, _crawler_loop).result()
+
+def _close_job_manager():
+    try:
+        run_crawler_job(_job_manager.close())
+    except Exception:
+        pass
+
+@lru_cache(maxsize=1)
+def _load_file_index(data_dir, version):
+    """Parsed index, PageRank and postings offsets for one index version"""
+    idx, pr = load_index(data_dir)
+    # Terms come from tokenize(), so they are already lowercase; the sorted
+    # list shares the idf dict's key objects rather than copying them
+    idx['sorted_terms'] = sorted(idx['idf'])
+    return idx, pr, load_postings_offsets(data_dir)
+
+def get_file_index(data_dir=DATA_DIR):
+    """Return (idx, pr, offsets) for the file-based index, reloading only after a rebuild"""
+    return _load_file_index(data_dir, file_index_version(data_dir))
+
+@dataclass(slots=True)
+class SearchHit:
+    """One file-based search result; orjson and Flask's encoder both serialize it as an object"""
+    url: str
+    title: str
+    snippet: str
+    score: float
+    length: int
+
+@lru_cache(maxsize=SEARCH_CACHE_SIZE)
+def _cached_file_search(query, alpha, beta, k, version):
+    """Result hits from the file-based index, memoized per index version"""
+    if rank_pool is not None:
+        rows = rank_pool.submit(
+            rank_in_worker, DATA_DIR, version, query, alpha, beta, k
+        ).result(timeout=RANK_TIMEOUT)
+        return tuple(SearchHit(*row) for row in rows)
+
+    idx, pr, offsets = _load_file_index(DATA_DIR, version)
+    return tuple(
+        SearchHit(doc.url, doc.title, doc.snippet, float(score), doc.length)
+        for doc, score in hybrid_rank_preloaded(query, idx, pr, DATA_DIR, alpha, beta, k=k, offsets=offsets)
+    )
+
+def search_results(query, alpha, beta, k):
+    """Ranked results from MongoDB if available, otherwise from the file-based index"""
+    if len(query) < 2 or STOPWORDS.issuperset(tokenize(query)):
+        return []
+    # The Mongo engine caches results itself and drops them when it reindexes
+    if USE_MONGODB and mongo_search_engine:
+        return mongo_search_engine.search_rows(query, alpha, beta, k)
+    return list(_cached_file_search(query, alpha, beta, k, file_index_version()))
+
 @app.route('/api/search', methods=['GET'])
 def search():
     """Search endpoint"""
-    query = request.args.get('q', '').strip()
+    query, alpha, beta, k = search_params(request.args)
     if not query:
         return jsonify({'error': 'Query parameter "q" is required'}), 400
 
-    alpha = float(request.args.get('alpha', 0.2))
-    beta = float(request.args.get('beta', 0.8))
-    k = int(request.args.get('k', 10))
-
     try:
-        # Use MongoDB if available, otherwise fall back to file-based search
-        if USE_MONGODB and mongo_search_engine:
-            results = mongo_search_engine.search(query, alpha, beta, k)
-        else:
-            results = hybrid_rank(query, DATA_DIR, alpha, beta, k=k)
+        results = search_results(query, alpha, beta, k)
 
         response = {
             'query': query,
             'total': len(results),
-            'results': [
-                {
-                    'url': doc.url,
-                    'title': doc.title,
-                    'snippet': doc.snippet,
-                    'score': float(score),
-                    'length': doc.length
-                }
-                for doc, score in results
-            ],
+            'results': results,
             'source': 'mongodb' if (USE_MONGODB and mongo_search_engine) else 'files'
         }
-        return jsonify(response)
+        return json_response(response)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/search/stream', methods=['GET'])
+def search_stream():
+    """Search endpoint returning one JSON result per line (NDJSON)
+
+    Results are encoded and sent one at a time, so a large k never holds
+    the whole encoded response in memory.
+    """
+    query, alpha, beta, k = search_params(request.args, max_k=MAX_STREAM_RESULTS)
+    if not query:
+        return jsonify({'error': 'Query parameter "q" is required'}), 400
+
+    try:
+        results = search_results(query, alpha, beta, k)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    def generate():
+        for item in results:
+            if ORJSON_AVAILABLE:
+                yield orjson.dumps(item) + b'\n'
+            else:
+                yield app.json.dumps(item) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/api/cache/clear', methods=['POST'])
+def clear_cache():
+    """Drop cached search results and the loaded file index
+
+    Only affects the process that receives the request, not other gunicorn
+    workers. Requires ADMIN_TOKEN as a bearer token.
+    """
+    global _stats_cache
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Not found'}), 404
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {ADMIN_TOKEN}'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    _cached_file_search.cache_clear()
+    _load_file_index.cache_clear()
+    _stats_cache = (0.0, None, None)
+    if mongo_search_engine:
+        mongo_search_engine.clear_caches()
+    return jsonify({'status': 'cleared'})
+
+# (expires at, etag, stats) for /api/stats
+_stats_cache = (0.0, None, None)
+
+def get_stats_cached():
+    """Return (etag, stats), recomputed at most once per STATS_TTL seconds"""
+    global _stats_cache
+    expires, etag, stats_data = _stats_cache
+    now = time.monotonic()
+    if now < expires:
+        return etag, stats_data
+
+    etag = index_etag('stats')
+    # Use MongoDB if available, otherwise fall back to file-based search
+    if USE_MONGODB and mongo_search_engine:
+        stats_data = mongo_search_engine.get_stats()
+        stats_data['source'] = 'mongodb'
+    else:
+        idx, _, _ = get_file_index()
+        stats_data = {
+            'total_docs': len(idx['docs']),
+            'avg_doc_length': idx['avgdl'],
+            'vocab_size': len(idx['idf']),
+            'source': 'files'
+        }
+    _stats_cache = (now + STATS_TTL, etag, stats_data)
+    return etag, stats_data
+
 @app.route('/api/stats', methods=['GET'])
 def stats():
     """Get index statistics"""
     try:
-        # Use MongoDB if available, otherwise fall back to file-based search
-        if USE_MONGODB and mongo_search_engine:
-            stats_data = mongo_search_engine.get_stats()
-            stats_data['source'] = 'mongodb'
-            return jsonify(stats_data)
-        else:
-            idx, pr = load_index(DATA_DIR)
-            return jsonify({
-                'total_docs': len(idx['docs']),
-                'avg_doc_length': idx['avgdl'],
-                'vocab_size': len(idx['idf']),
-                'source': 'files'
-            })
+        etag, stats_data = get_stats_cached()
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+
+        response = json_response(stats_data)
+        response.set_etag(etag)
+        return response
     except Exception as e:
         print(f"Error in /api/stats: {e}")
         import traceback
@@ -139,38 +416,50 @@ def stats():
 def suggest():
     """Get search suggestions based on partial query"""
     query = request.args.get('q', '').strip().lower()
-    limit = int(request.args.get('limit', 8))
+    limit = bounded(request.args, 'limit', 8, int, 1, MAX_SUGGESTIONS)
 
     if not query or len(query) < 2:
         return jsonify({'suggestions': []})
 
     try:
+        etag = index_etag('suggest', query, limit)
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+
         if USE_MONGODB and mongo_search_engine:
             # Get suggestions from MongoDB - search titles and extract unique terms
             suggestions = mongo_search_engine.get_suggestions(query, limit)
         else:
             # Get suggestions from file-based index with fuzzy matching
-            idx, _ = load_index(DATA_DIR)
+            idx, _, _ = get_file_index()
+            sorted_terms, idf = idx['sorted_terms'], idx['idf']
             query_normalized = ''.join(c for c in query if c.isalnum())
 
-            # Find matching terms in vocabulary
-            matching_terms = []
-            for term in idx['idf'].keys():
-                # Exact prefix match
-                if term.startswith(query):
-                    matching_terms.append((term, 0, idx['idf'].get(term, 0)))
-                # Match without spaces (e.g., "for loops" -> "forloops")
-                elif len(query_normalized) >= 3 and term.startswith(query_normalized):
-                    matching_terms.append((term, 1, idx['idf'].get(term, 0)))
-                # Contains the query
-                elif query in term and len(query) >= 3:
-                    matching_terms.append((term, 2, idx['idf'].get(term, 0)))
+            # Exact prefix matches, then matches without spaces (e.g., "for loops"
+            # -> "forloops"), both found by bisecting the sorted vocabulary
+            matching_terms = [(term, 0, idf[term]) for term in prefix_range(sorted_terms, query)]
+            if len(matching_terms) < limit and len(query_normalized) >= 3:
+                matching_terms += [
+                    (term, 1, idf[term]) for term in prefix_range(sorted_terms, query_normalized)
+                    if not term.startswith(query)
+                ]
+
+            # Contains the query: a full vocabulary scan, only needed when the
+            # prefix tiers (which always rank first) leave room
+            if len(matching_terms) < limit and len(query) >= 3:
+                matching_terms += [
+                    (term, 2, idf[term]) for term in sorted_terms
+                    if query in term and not term.startswith(query)
+                    and not (len(query_normalized) >= 3 and term.startswith(query_normalized))
+                ]
 
             # Sort by priority (lower is better), then by IDF (lower is more common)
             matching_terms.sort(key=lambda x: (x[1], x[2]))
             suggestions = [term for term, _, _ in matching_terms[:limit]]
 
-        return jsonify({'suggestions': suggestions})
+        response = json_response({'suggestions': suggestions})
+        response.set_etag(etag)
+        return response
     except Exception as e:
         print(f"Error in /api/suggest: {e}")
         import traceback
@@ -187,8 +476,10 @@ def crawler():
             return jsonify({'error': 'URL is required'}), 400
 
         start_url = data.get('url')
-        max_depth = data.get('maxDepth', 2)
-        max_pages = min(data.get('maxPages', 50), 50)  # Cap at 50
+        max_depth = bounded(data, 'maxDepth', 2, int, 0, MAX_CRAWL_DEPTH)
+        max_pages = min(bounded(data, 'maxPages', 50, int, 1, 10_000), 50)  # Cap at 50
+        # Pages fetched at once; the job manager caps it
+        concurrency = bounded(data, 'concurrency', 5, int, 1, 10_000)
 
         # Validate URL
         from urllib.parse import urlparse
@@ -204,27 +495,30 @@ def crawler():
             return jsonify({'error': 'MongoDB is required for crawler'}), 400
 
         # Create crawler job
-        import asyncio
-        from motor.motor_asyncio import AsyncIOMotorClient
-        from crawler_jobs import CrawlerJobManager
-
-        mongo_client = AsyncIOMotorClient(MONGODB_URI)
-        job_manager = CrawlerJobManager(mongo_client)
-
-        # Create job asynchronously
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        job_id = loop.run_until_complete(
-            job_manager.create_job(start_url, max_depth, max_pages)
+        job_manager = get_job_manager()
+        use_worker = run_crawl_job is not None
+        job_id = run_crawler_job(
+            job_manager.create_job(start_url, max_depth, max_pages, worker=use_worker, concurrency=concurrency)
         )
-        loop.close()
+
+        if use_worker:
+            try:
+                run_crawl_job.delay(job_id)
+            except Exception as e:
+                # Broker unreachable: let the frontend's polling drive the job
+                print(f"⚠ Could not queue crawl job {job_id}: {e}")
+                run_crawler_job(job_manager.set_worker(job_id, False))
+                use_worker = False
 
         return jsonify({
             'status': 'started',
             'job_id': job_id,
+            'mode': 'worker' if use_worker else 'polling',
             'message': f'Crawl job created for {start_url}'
         }), 202
 
+    except ParamError:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -237,17 +531,7 @@ def get_crawler_status(job_id):
         if not USE_MONGODB or not mongo_search_engine:
             return jsonify({'error': 'MongoDB is required'}), 400
 
-        from motor.motor_asyncio import AsyncIOMotorClient
-        from crawler_jobs import CrawlerJobManager
-
-        mongo_client = AsyncIOMotorClient(MONGODB_URI)
-        job_manager = CrawlerJobManager(mongo_client)
-
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        job = loop.run_until_complete(job_manager.get_job(job_id))
-        loop.close()
+        job = run_crawler_job(get_job_manager().get_job(job_id))
 
         if not job:
             return jsonify({'error': 'Job not found'}), 404
@@ -263,27 +547,22 @@ def get_crawler_status(job_id):
 
 @app.route('/api/crawler/<job_id>/process', methods=['POST'])
 def process_crawler_batch(job_id):
-    """Process a batch of URLs for the job (called by frontend polling)"""
+    """Process a batch of URLs for the job (called by frontend polling)
+
+    Jobs run by a Celery worker are returned as they are, without processing.
+    """
     try:
         if not USE_MONGODB or not mongo_search_engine:
             return jsonify({'error': 'MongoDB is required'}), 400
 
-        from motor.motor_asyncio import AsyncIOMotorClient
-        from crawler_jobs import CrawlerJobManager
-
-        mongo_client = AsyncIOMotorClient(MONGODB_URI)
-        job_manager = CrawlerJobManager(mongo_client)
-
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        job = loop.run_until_complete(
-            job_manager.process_job_batch(job_id, batch_size=5, timeout=8)
+        # The manager's pooled HTTP session stays open across batches
+        job = run_crawler_job(
+            get_job_manager().process_job_batch(job_id, batch_size=5, timeout=8)
         )
-        loop.close()
 
-        if 'error' in job:
-            return jsonify(job), 404
+        # None if the job was removed (e.g. by cleanup_old_jobs) mid-batch
+        if not job or 'error' in job:
+            return jsonify(job or {'error': 'Job not found'}), 404
 
         # Remove _id for JSON serialization
         job.pop('_id', None)
@@ -325,4 +604,7 @@ if __name__ == '__main__':
     print(f"  - MongoDB: {'✓ primary' if has_mongo else '✗ disabled'}")
     print(f"  - Files: {'✓ fallback' if has_files else '✗ not available'} ({DATA_DIR})")
 
-    app.run(host='0.0.0.0', port=port, debug=True)
+    # Development server only; production runs under gunicorn (see gunicorn_conf.py).
+    # Debug mode and its reloader are opt-in with FLASK_DEBUG=1
+    debug = os.environ.get('FLASK_DEBUG', '0').lower() in ('1', 'true', 'yes')
+    app.run(host='0.0.0.0', port=port, debug=debug, use_reloader=debug)
@@ -1,8 +1,11 @@
 #!/bin/bash
 
-# Start the backend search server
+# Start the backend search server under gunicorn (see gunicorn_conf.py);
+# `python3 server.py` runs Flask's development server instead
 
 echo "🚀 Starting search server..."
 echo ""
 
-DATA_DIR=./data_wiki PORT=5001 python3 server.py
+export DATA_DIR=${DATA_DIR:-./data_wiki}
+export PORT=${PORT:-5001}
+exec gunicorn -c gunicorn_conf.py server:app
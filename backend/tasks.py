@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Celery tasks that run crawler jobs outside the web process
+Start a worker with: celery -A tasks worker --loglevel=info
+"""
+
+import asyncio
+import os
+
+# Celery is optional - without it (or without REDIS_URL) the frontend drives
+# crawl jobs batch by batch through /api/crawler/<job_id>/process
+try:
+    from celery import Celery
+    CELERY_AVAILABLE = True
+except ImportError:
+    CELERY_AVAILABLE = False
+
+# Load .env file if available
+try:
+    from load_env import load_env
+    load_env()
+except ImportError:
+    pass
+
+REDIS_URL = os.environ.get('REDIS_URL', '')
+MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/')
+
+# URLs fetched per batch when a worker runs the job (no serverless time limit)
+WORKER_BATCH_SIZE = 10
+
+celery_app = Celery('search', broker=REDIS_URL) if CELERY_AVAILABLE and REDIS_URL else None
+
+# One event loop, Motor client and job manager per worker process
+_loop = None
+_job_manager = None
+
+def _get_job_manager():
+    """Return this worker process's CrawlerJobManager, creating it on first use"""
+    global _loop, _job_manager
+    if _job_manager is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from crawler_jobs import CrawlerJobManager
+
+        _loop = asyncio.new_event_loop()
+
+        # Create the client on the loop it will be used from
+        async def _create():
+            return CrawlerJobManager(AsyncIOMotorClient(MONGODB_URI))
+
+        _job_manager = _loop.run_until_complete(_create())
+    return _job_manager
+
+async def run_job(job_manager, job_id):
+    """Process a job's queue batch by batch until it completes"""
+    while True:
+        job = await job_manager.process_job_batch(
+            job_id, batch_size=WORKER_BATCH_SIZE, timeout=8, from_worker=True
+        )
+        if not job or 'error' in job or job.get('status') == 'completed':
+            return job
+
+if celery_app is not None:
+    @celery_app.task(name='crawler.run_job', ignore_result=True)
+    def run_crawl_job(job_id):
+        """Run a crawler job created by /api/crawler to completion"""
+        job_manager = _get_job_manager()
+        try:
+            _loop.run_until_complete(run_job(job_manager, job_id))
+        except Exception:
+            # Hand the job back to the frontend's polling rather than leave it stuck
+            _loop.run_until_complete(job_manager.set_worker(job_id, False))
+            raise
+else:
+    run_crawl_job = None